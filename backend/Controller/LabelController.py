@@ -1,38 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
-from ..Service import authService, labelService
+from .. import conditional
+from ..Service import asyncLabelService, asyncTaskService, authService, labelService
 from .. import schemas
 from backend.Service import labelService
-from ..database import get_db
+from ..database import get_async_read_db, get_db
 
 router = APIRouter()
 
 @router.get("/", response_model=list[schemas.Label])
-def read_labels(
+async def read_labels(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: schemas.User = Depends(authService.get_current_user)
 ):
-    return labelService.get_labels(db, skip=skip, limit=limit)
+    version = await asyncLabelService.get_labels_version(db)
+    not_modified = conditional.evaluate(request, response, "labels", request.url.query, version)
+    if not_modified is not None:
+        return not_modified
+    return await asyncLabelService.get_labels(db, skip=skip, limit=limit)
 
 @router.get("/with_count", response_model=List[schemas.LabelWithCount])
-def read_labels_with_count(
-    db: Session = Depends(get_db),
+async def read_labels_with_count(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: schemas.User = Depends(authService.get_current_user)
 ):
-    labels_with_counts = labelService.get_labels_with_usage_count(db, user_id=current_user.id)
+    # Counts derive from the label links of the user's visible tasks, which the
+    # task version already tracks (label links touch updated_at).
+    version = await asyncTaskService.get_tasks_version(db, current_user.id)
+    not_modified = conditional.evaluate(request, response, "labels/with_count", current_user.id, version)
+    if not_modified is not None:
+        return not_modified
+    labels_with_counts = await asyncLabelService.get_labels_with_usage_count(db, user_id=current_user.id)
     return [{"id": label.id, "name": label.name, "color": label.color, "count": count} for label, count in labels_with_counts]
 
 @router.get("/{label_id}", response_model=schemas.Label)
-def read_label(
+async def read_label(
+    request: Request,
+    response: Response,
     label_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: schemas.User = Depends(authService.get_current_user)
 ):
-    db_label = labelService.get_label(db, label_id=label_id)
+    version = await asyncLabelService.get_label_version(db, label_id)
+    if version is not None:
+        not_modified = conditional.evaluate(request, response, "label", label_id, version)
+        if not_modified is not None:
+            return not_modified
+    db_label = await asyncLabelService.get_label(db, label_id=label_id)
     if db_label is None:
         raise HTTPException(status_code=404, detail="Label not found")
     return db_label
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
+from backend import conditional, events
 from backend.Model import models
-from backend.database import get_db
-from ..Service import authService, taskService
+from backend.database import get_async_db, get_async_read_db, get_db, get_read_db
+from ..Service import asyncTaskService, authService, taskService
 
 from .. import schemas
 from backend.Service import labelService, taskService
@@ -19,32 +25,226 @@ def create_task(
 ):
     return taskService.create_task(db=db, task=task, user_id=current_user.id)
 
+@router.post("/bulk", response_model=schemas.TaskBulkResult)
+def create_tasks_bulk(
+    # Validated per item below; the schema extras document the expected body.
+    items: List[Dict[str, Any]] = Body(..., json_schema_extra={
+        "items": {"$ref": "#/components/schemas/TaskCreate"}, "maxItems": taskService.TASK_BULK_MAX_ITEMS,
+    }),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(authService.get_current_user)
+):
+    if len(items) > taskService.TASK_BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {taskService.TASK_BULK_MAX_ITEMS} tasks per request")
+
+    # Items are validated one by one so a bad item is reported in place
+    # instead of rejecting the whole request; valid items are still created.
+    results = [{"index": i, "task": None, "error": None} for i in range(len(items))]
+    valid = []
+    for result, item in zip(results, items):
+        try:
+            valid.append((result, schemas.TaskCreate.model_validate(item)))
+        except ValidationError as e:
+            result["error"] = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+    created = taskService.create_tasks_bulk(db, [task for _, task in valid], user_id=current_user.id) if valid else []
+    for (result, _), task in zip(valid, created):
+        result["task"] = task
+    return {"created": len(created), "results": results}
+
+def _parse_fields(fields: Optional[str]):
+    try:
+        return schemas.parse_task_fields(fields) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _sparse_response(adapter, content, response: Response):
+    # Sparse results do not fit response_model, so they are rendered here; the
+    # ETag headers already set on the injected response are carried over.
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(adapter.dump_json(adapter.validate_python(content)), media_type="application/json", headers=headers)
+
+def _parse_filter(labels: Optional[str], **params):
+    # labels: comma-separated label ids.
+    try:
+        label_ids = [int(label_id) for label_id in labels.split(",") if label_id.strip()] if labels else []
+    except ValueError:
+        raise HTTPException(status_code=400, detail="labels must be comma-separated label ids")
+    try:
+        return taskService.build_task_filter(label_ids=label_ids, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Reads run on the event loop through the async read session; writes stay on
+# the threadpool with the sync primary session. GETs answer If-None-Match from
+# a version query before loading any rows. `fields` (comma-separated
+# schemas.Task fields) limits both the columns loaded and the response body.
+# Due and creation ranges are half-open (after <= value < before); `due`
+# presets are evaluated in `tz`; `labels` takes ids, matched any or all.
 @router.get("/", response_model=schemas.TaskPagination)
-def read_tasks(
+async def read_tasks(
+    request: Request,
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     status: models.TaskStatus = None,
     is_active: bool = True,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    sort: schemas.TaskSortKey = schemas.TaskSortKey.CREATED_AT,
+    total_mode: schemas.TotalMode = schemas.TotalMode.EXACT,
+    fields: Optional[str] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    due: Optional[schemas.DuePreset] = None,
+    tz: str = "UTC",
+    labels: Optional[str] = None,
+    label_match: schemas.LabelMatch = schemas.LabelMatch.ANY,
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: schemas.User = Depends(authService.get_current_user)
 ):
-    return taskService.get_tasks(db, user_id=current_user.id, skip=skip, limit=limit, status=status, is_active=is_active)
+    selected = _parse_fields(fields)
+    task_filter = _parse_filter(
+        labels, due_after=due_after, due_before=due_before, created_after=created_after,
+        created_before=created_before, due=due, tz=tz, label_match=label_match,
+    )
+    version = await asyncTaskService.get_tasks_version(db, current_user.id)
+    # The resolved filter is part of the tag: a preset's window moves with the clock.
+    not_modified = conditional.evaluate(request, response, "tasks", current_user.id, request.url.query, task_filter, version)
+    if not_modified is not None:
+        return not_modified
+    try:
+        page = await asyncTaskService.get_tasks(
+            db, user_id=current_user.id, skip=skip, limit=limit, status=status, is_active=is_active,
+            after=after, sort=sort, total_mode=total_mode, fields=selected, task_filter=task_filter
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if selected:
+        return _sparse_response(schemas.task_fields_adapters(selected)[1], page, response)
+    return page
 
 @router.get("/all", response_model=list[schemas.Task])
-def read_all_tasks(
+async def read_all_tasks(
+    request: Request,
+    response: Response,
     is_active: bool = True,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: schemas.User = Depends(authService.get_current_user)
+):
+    selected = _parse_fields(fields)
+    version = await asyncTaskService.get_tasks_version(db, current_user.id)
+    not_modified = conditional.evaluate(request, response, "tasks/all", current_user.id, request.url.query, version)
+    if not_modified is not None:
+        return not_modified
+    tasks = await asyncTaskService.get_all_user_tasks(db, user_id=current_user.id, is_active=is_active, fields=selected)
+    if selected:
+        return _sparse_response(schemas.task_fields_adapters(selected)[0], tasks, response)
+    return tasks
+
+@router.get("/all/stream", response_class=StreamingResponse)
+def stream_all_tasks(
+    is_active: bool = True,
+    db: Session = Depends(get_read_db),
     current_user: schemas.User = Depends(authService.get_current_user)
 ):
-    return taskService.get_all_user_tasks(db, user_id=current_user.id, is_active=is_active)
+    # NDJSON: one schemas.Task per line, written batch by batch as rows arrive.
+    def lines():
+        for batch in taskService.iter_user_tasks(db, user_id=current_user.id, is_active=is_active):
+            yield b"".join(schemas.TaskAdapter.dump_json(task) + b"\n" for task in schemas.TaskListAdapter.validate_python(batch))
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/search", response_model=schemas.TaskSearchPage)
+async def search_tasks(
+    request: Request,
+    response: Response,
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    is_active: bool = True,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: schemas.User = Depends(authService.get_current_user)
+):
+    # Ranked full-text match on title and description; every word must occur,
+    # the last one as a prefix.
+    version = await asyncTaskService.get_tasks_version(db, current_user.id)
+    not_modified = conditional.evaluate(request, response, "tasks/search", current_user.id, request.url.query, version)
+    if not_modified is not None:
+        return not_modified
+    try:
+        return await asyncTaskService.search_tasks(db, current_user.id, q, skip=skip, limit=limit, is_active=is_active)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stats", response_model=schemas.TaskStats)
+async def read_task_stats(
+    is_active: bool = True,
+    tz: str = "UTC",
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: schemas.User = Depends(authService.get_current_user)
+):
+    # Dashboard counts: by status, overdue, due today and this week (in `tz`),
+    # and a progress histogram. Served from a per-user cache that task writes
+    # invalidate, so polling it is cheap.
+    try:
+        return await asyncTaskService.get_task_stats(db, current_user.id, is_active=is_active, tz=tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/changes", response_model=schemas.ChangeFeed)
+async def read_changes(
+    since: Optional[str] = None,
+    limit: int = 500,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: schemas.User = Depends(authService.get_current_user)
+):
+    # Delta sync: pass the previous next_cursor as `since` and keep going while
+    # has_more is set. resync_required means the cursor is missing or older
+    # than the retained log; refetch /tasks/all and resume from next_cursor.
+    try:
+        return await asyncTaskService.get_changes(db, current_user.id, since=since, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_changes(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(authService.get_current_user)
+):
+    # Server-sent events: one `upsert`, `delete` or `deactivate` event per
+    # change the user can see, carrying the entity and id only; payloads come
+    # from /tasks/changes. A `resync` event means the client fell behind and
+    # was dropped; it should catch up from its feed cursor and reconnect.
+    subscription = events.hub.subscribe(current_user.id)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+    # `db` is the session the auth lookup used (dependencies are cached per
+    # request); give its connection back instead of holding it for the stream.
+    await db.close()
+    return StreamingResponse(
+        events.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{task_id}", response_model=schemas.Task)
-def read_task(
+async def read_task(
+    request: Request,
+    response: Response,
     task_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: schemas.User = Depends(authService.get_current_user)
 ):
-    db_task = taskService.get_task(db, task_id=task_id, user_id=current_user.id)
+    # Not visible: fall through so the full lookup produces the 404.
+    version = await asyncTaskService.get_task_version(db, task_id, current_user.id)
+    if version is not None:
+        not_modified = conditional.evaluate(request, response, "task", task_id, current_user.id, version)
+        if not_modified is not None:
+            return not_modified
+    db_task = await asyncTaskService.get_task(db, task_id=task_id, user_id=current_user.id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     if not db_task.is_active:
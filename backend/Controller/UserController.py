@@ -1,34 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 
-from ..Service import authService, userService
+from ..Service import authService, hashService, userService
 
 from .. import schemas
 from ..database import get_db
 
 router = APIRouter()
 
+hashing_busy = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many concurrent password operations, please retry",
+    headers={"Retry-After": "1"},
+)
+
+# Async so bcrypt waits on the hashing pool instead of holding a worker thread;
+# the blocking DB calls are pushed to the threadpool explicitly.
 @router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     try:
-        db_user = userService.get_user_by_email(db, email=user.email)
+        db_user = await run_in_threadpool(userService.get_user_by_email, db, email=user.email)
         if db_user:
             raise Exception("Email already registered")
-        return userService.create_user(db=db, user=user)
+        hashed_password = await authService.get_password_hash_async(user.password)
+        return await run_in_threadpool(userService.create_user, db=db, user=user, hashed_password=hashed_password)
+    except hashService.HashingPoolBusy:
+        raise hashing_busy
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = userService.get_user_by_email(db, email=form_data.username)
-    if not user or not authService.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(response: Response, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(userService.get_user_by_email, db, email=form_data.username)
+    matched, new_hash = False, None
+    if user:
+        try:
+            matched, new_hash = await authService.verify_password_async(form_data.password, user.hashed_password)
+        except hashService.HashingPoolBusy:
+            raise hashing_busy
+    if not matched:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored hash was made with a different BCRYPT_ROUNDS; upgrade it in place.
+        await run_in_threadpool(userService.update_password_hash, db, user, new_hash)
     access_token_expires = timedelta(minutes=authService.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = authService.create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -47,5 +68,5 @@ def login_for_access_token(response: Response, form_data: OAuth2PasswordRequestF
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: schemas.User = Depends(authService.get_current_user)):
+async def read_users_me(current_user: schemas.User = Depends(authService.get_current_user)):
     return current_user
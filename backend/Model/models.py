@@ -1,5 +1,6 @@
 import enum
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Enum, Table
+from datetime import datetime, timezone
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Boolean, ForeignKey, DateTime, Enum, JSON, Table, Index, UniqueConstraint, DDL, event, insert_sentinel
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -9,6 +10,13 @@ class TaskStatus(str, enum.Enum):
     DOING = "DOING"
     DONE = "DONE"
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
+def dialect_index(dialect: str, *args, **kwargs) -> Index:
+    """An Index created only on `dialect`; alembic/env.py reads info["dialect"]."""
+    return Index(*args, info={"dialect": dialect}, **kwargs).ddl_if(dialect=dialect)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -23,27 +31,103 @@ class User(Base):
 
 task_participants = Table('task_participants', Base.metadata,
     Column('task_id', Integer, ForeignKey('tasks.id'), primary_key=True),
-    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True)
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    # The PK only serves task -> users; "tasks shared with me" needs the reverse.
+    Index('ix_task_participants_user_id_task_id', 'user_id', 'task_id')
 )
 
 task_labels = Table('task_labels', Base.metadata,
     Column('task_id', Integer, ForeignKey('tasks.id'), primary_key=True),
-    Column('label_id', Integer, ForeignKey('labels.id'), primary_key=True)
+    Column('label_id', Integer, ForeignKey('labels.id'), primary_key=True),
+    # Label filters look tasks up by label; the primary key only serves task -> labels.
+    Index('ix_task_labels_label_id_task_id', 'label_id', 'task_id'),
+)
+
+# Per-user usage count of each label over the user's visible tasks, kept up to
+# date by labelCountService so /labels/with_count is a primary-key lookup.
+user_label_counts = Table('user_label_counts', Base.metadata,
+    Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
+    Column('label_id', Integer, ForeignKey('labels.id'), primary_key=True),
+    Column('count', Integer, nullable=False, default=0)
+)
+
+# Append-only change feed behind GET /tasks/changes. Task changes get one row
+# per member (owner and participants); label changes are global (user_id NULL).
+# AUTOINCREMENT keeps seq from being reused after the newest rows are pruned.
+# txid is the writing transaction's id on Postgres, where seq order is not
+# commit order (see changeService); it stays NULL on SQLite.
+change_log = Table('change_log', Base.metadata,
+    Column('seq', Integer, primary_key=True, autoincrement=True),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=True),
+    Column('entity', String, nullable=False),
+    Column('entity_id', Integer, nullable=False),
+    Column('op', String, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, default=utcnow),
+    Column('txid', BigInteger, nullable=True),
+    Index('ix_change_log_user_id_seq', 'user_id', 'seq'),
+    dialect_index('postgresql', 'ix_change_log_user_id_txid_seq', 'user_id', 'txid', 'seq'),
+    sqlite_autoincrement=True,
+)
+
+# One row per due-date reminder fired by the scheduler in backend/reminders.py.
+# The unique key makes firing idempotent: a reminder re-fired after a restart,
+# or by a second scheduler, is ignored, and lets the scheduler skip deadlines
+# that already have one when it reloads.
+reminders = Table('reminders', Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('task_id', Integer, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False),
+    Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+    Column('due_date', DateTime(timezone=True), nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False, default=utcnow),
+    UniqueConstraint('task_id', 'due_date', name='uq_reminders_task_id_due_date'),
+)
+
+# Durable queue behind backend/jobs.py. A queued job is ready once visible_at
+# has passed; claiming it pushes visible_at out by the visibility timeout, so
+# a job whose worker died becomes claimable again. Finished jobs are deleted;
+# jobs out of attempts stay behind as 'dead' with their last error.
+jobs = Table('jobs', Base.metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('payload', JSON, nullable=False),
+    # Lower runs first.
+    Column('priority', Integer, nullable=False, default=0),
+    Column('status', String, nullable=False, default='queued'),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('max_attempts', Integer, nullable=False),
+    Column('visible_at', DateTime(timezone=True), nullable=False, default=utcnow),
+    Column('locked_by', String, nullable=True),
+    Column('last_error', Text, nullable=True),
+    Column('created_at', DateTime(timezone=True), nullable=False, default=utcnow),
+    # Claims read ready jobs in (priority, visible_at) order straight off this index.
+    Index('ix_jobs_status_priority_visible_at', 'status', 'priority', 'visible_at'),
 )
 
 class Label(Base):
     __tablename__ = "labels"
+    __table_args__ = (
+        # max(updated_at) is the label component of the task ETags.
+        Index('ix_labels_updated_at', 'updated_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     color = Column(String, default="#FEFBFB")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
 
     tasks = relationship("Task", secondary=task_labels, back_populates="labels")
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index('ix_tasks_user_id_is_active_status', 'user_id', 'is_active', 'status'),
+        Index('ix_tasks_due_date', 'due_date'),
+        # SQLite cannot say which RETURNING row belongs to which VALUES row;
+        # this numbers the rows of a multi-row INSERT so bulk creates can
+        # match ids to inputs (sort_by_parameter_order) in one statement.
+        insert_sentinel('insert_sentinel'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
@@ -52,10 +136,56 @@ class Task(Base):
     progress = Column(Integer, default=0)
     is_active = Column(Boolean, default=True)
     due_date = Column(DateTime(timezone=True), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set client-side so every row carries microseconds; keyset pagination compares on it.
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+    # Client-side for microseconds: ETags compare it, and label and participant
+    # changes set it explicitly.
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="tasks")
     labels = relationship("Label", secondary=task_labels, back_populates="tasks")
     participants = relationship("User", secondary=task_participants, back_populates="participated_tasks")
+
+# Full-text search over title and description, outside the ORM mapping.
+# SQLite: an FTS5 table kept in sync by triggers, so core bulk inserts are
+# covered too. Its `members` column holds a token per user who can see the
+# task ("u<id>"), so a search only ranks the caller's matches instead of every
+# match in the index; visible_to() still decides what is returned.
+# Postgres: a generated tsvector column with a GIN index, which the database
+# maintains by itself. searchService queries both; its reindex() rebuilds them.
+_TASK_MEMBERS = (
+    "(SELECT 'u' || t.user_id || coalesce(' ' || (SELECT group_concat('u' || p.user_id, ' ') "
+    "FROM task_participants p WHERE p.task_id = t.id), '') FROM tasks t WHERE t.id = {task_id})"
+)
+TASK_SEARCH_DDL = {
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+        "title, description, members, tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts(rowid, title, description, members) "
+        "VALUES (new.id, new.title, new.description, 'u' || new.user_id); END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, user_id ON tasks BEGIN "
+        "UPDATE tasks_fts SET title = new.title, description = new.description, "
+        f"members = {_TASK_MEMBERS.format(task_id='new.id')} WHERE rowid = new.id; END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+        "DELETE FROM tasks_fts WHERE rowid = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_participant_insert AFTER INSERT ON task_participants BEGIN "
+        f"UPDATE tasks_fts SET members = {_TASK_MEMBERS.format(task_id='new.task_id')} WHERE rowid = new.task_id; END",
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_participant_delete AFTER DELETE ON task_participants BEGIN "
+        f"UPDATE tasks_fts SET members = {_TASK_MEMBERS.format(task_id='old.task_id')} WHERE rowid = old.task_id; END",
+    ),
+    "postgresql": (
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+    ),
+}
+
+# The participant triggers need task_participants, which is created after tasks.
+for _dialect, _statements in TASK_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+# Triggers go with their tables; the FTS5 table has to be dropped explicitly.
+event.listen(Base.metadata, "after_drop", DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite"))
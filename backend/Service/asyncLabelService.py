@@ -0,0 +1,37 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from . import labelService
+
+# Async entry points for labelService, run through AsyncSession.run_sync like
+# asyncTaskService.
+
+async def create_label(db: AsyncSession, label: schemas.LabelCreate):
+    return await db.run_sync(labelService.create_label, label)
+
+async def get_labels(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return await db.run_sync(labelService.get_labels, skip, limit)
+
+async def get_label(db: AsyncSession, label_id: int):
+    return await db.run_sync(labelService.get_label, label_id)
+
+async def get_labels_version(db: AsyncSession):
+    return await db.run_sync(labelService.get_labels_version)
+
+async def get_label_version(db: AsyncSession, label_id: int):
+    return await db.run_sync(labelService.get_label_version, label_id)
+
+async def update_label(db: AsyncSession, label_id: int, label: schemas.LabelUpdate):
+    return await db.run_sync(labelService.update_label, label_id, label)
+
+async def delete_label(db: AsyncSession, label_id: int):
+    return await db.run_sync(labelService.delete_label, label_id)
+
+async def get_labels_with_usage_count(db: AsyncSession, user_id: int):
+    return await db.run_sync(labelService.get_labels_with_usage_count, user_id)
+
+async def add_label_to_task(db: AsyncSession, task_id: int, label_name: str, user_id: int):
+    return await db.run_sync(labelService.add_label_to_task, task_id, label_name, user_id)
+
+async def remove_label_from_task(db: AsyncSession, task_id: int, label_id: int, user_id: int):
+    return await db.run_sync(labelService.remove_label_from_task, task_id, label_id, user_id)
@@ -0,0 +1,54 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from . import changeService, searchService, taskService
+
+# Async entry points for taskService. Each call runs the sync implementation
+# through AsyncSession.run_sync, so there is still only one version of every
+# query. The loading profiles eager-load everything schemas.Task renders;
+# nothing may lazy-load once the call has returned.
+
+async def get_task(db: AsyncSession, task_id: int, user_id: int, profile: str = "full"):
+    return await db.run_sync(taskService.get_task, task_id, user_id, profile)
+
+async def get_tasks(db: AsyncSession, user_id: int, **options):
+    return await db.run_sync(taskService.get_tasks, user_id, **options)
+
+async def get_task_version(db: AsyncSession, task_id: int, user_id: int):
+    return await db.run_sync(taskService.get_task_version, task_id, user_id)
+
+async def get_tasks_version(db: AsyncSession, user_id: int):
+    return await db.run_sync(taskService.get_tasks_version, user_id)
+
+async def get_all_user_tasks(db: AsyncSession, user_id: int, is_active: bool = True, profile: str = "full", fields=None):
+    return await db.run_sync(taskService.get_all_user_tasks, user_id, is_active, profile, fields)
+
+async def get_changes(db: AsyncSession, user_id: int, since=None, limit: int = 500):
+    return await db.run_sync(changeService.get_changes, user_id, since, limit)
+
+async def get_task_stats(db: AsyncSession, user_id: int, **options):
+    return await db.run_sync(taskService.get_task_stats, user_id, **options)
+
+async def search_tasks(db: AsyncSession, user_id: int, q: str, **options):
+    return await db.run_sync(searchService.search_tasks, user_id, q, **options)
+
+async def create_task(db: AsyncSession, task: schemas.TaskCreate, user_id: int):
+    return await db.run_sync(taskService.create_task, task, user_id)
+
+async def update_task(db: AsyncSession, task_id: int, task: schemas.TaskUpdate, user_id: int):
+    return await db.run_sync(taskService.update_task, task_id, task, user_id)
+
+async def delete_task(db: AsyncSession, task_id: int, user_id: int):
+    return await db.run_sync(taskService.delete_task, task_id, user_id)
+
+async def deactivate_task(db: AsyncSession, task_id: int, user_id: int):
+    return await db.run_sync(taskService.deactivate_task, task_id, user_id)
+
+async def activate_task(db: AsyncSession, task_id: int, user_id: int):
+    return await db.run_sync(taskService.activate_task, task_id, user_id)
+
+async def add_participant_to_task(db: AsyncSession, task_id: int, participant_email: str, owner_id: int):
+    return await db.run_sync(taskService.add_participant_to_task, task_id, participant_email, owner_id)
+
+async def remove_participant_from_task(db: AsyncSession, task_id: int, participant_id: int, owner_id: int):
+    return await db.run_sync(taskService.remove_participant_from_task, task_id, participant_id, owner_id)
@@ -1,27 +1,44 @@
+import hashlib
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from . import userService
+from . import asyncUserService, hashService
+from backend.Model import models
 from .. import schemas, database
+from ..cache import TTLCache
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY", "allen-zang-secret-key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 1024))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users keyed by (token subject, token hash). The JWT is still
+# decoded and its expiry checked on every request; only the DB lookup is cached.
+user_cache = TTLCache("auth_users", maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+pwd_context = hashService.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashService.verify_password(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hashService.hash_password(password)
+
+# Request handlers use the async variants, which run bcrypt in the hashing pool.
+async def get_password_hash_async(password: str) -> str:
+    return await hashService.pool.run(hashService.hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    """Return (matched, new_hash); new_hash is set when the stored cost is out of date."""
+    return await hashService.pool.run(hashService.verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -33,7 +50,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,10 +65,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    # We need to create a new session here or use the dependency. 
-    # The dependency injection in FastAPI is tricky with nested dependencies if not careful.
-    # Here we use the db session passed from the dependency.
-    user = userService.get_user_by_email(db, email=token_data.email)
-    if user is None:
+    cache_key = (token_data.email, hashlib.sha256(token.encode()).hexdigest())
+    user = user_cache.get(cache_key)
+    if user is not None:
+        return user
+
+    # Cache miss: look the user up on the async session so the event loop is not blocked.
+    db_user = await asyncUserService.get_user_by_email(db, email=token_data.email)
+    if db_user is None:
         raise credentials_exception
+    # Cache a detached snapshot, not the ORM row bound to this request's session.
+    user = schemas.User.model_validate(db_user)
+    user_cache.set(cache_key, user)
     return user
+
+def invalidate_cached_user(email: Optional[str] = None, user_id: Optional[int] = None):
+    user_cache.invalidate_where(lambda key, user: key[0] == email or user.id == user_id)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_user_change(mapper, connection, target):
+    invalidate_cached_user(email=target.email, user_id=target.id)
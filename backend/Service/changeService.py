@@ -0,0 +1,166 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import BigInteger, Text, cast, delete, func, insert, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from backend.Model import models
+from .. import events, jobs, schemas
+from . import taskService
+from .visibilityService import visible_to
+
+TASK, LABEL = schemas.ChangeEntity.TASK.value, schemas.ChangeEntity.LABEL.value
+UPSERT = schemas.ChangeOp.UPSERT.value
+
+CHANGE_FEED_MAX_BATCH = int(os.getenv("CHANGE_FEED_MAX_BATCH", 1000))
+CHANGE_LOG_RETENTION_DAYS = float(os.getenv("CHANGE_LOG_RETENTION_DAYS", 7))
+
+# Writers call record()/record_task() inside their transaction, before
+# committing, so a change is in the feed exactly when it is visible. The same
+# rows are pushed to open /tasks/stream connections once the transaction
+# commits.
+#
+# Cursors must only move forward over committed changes. On SQLite writers
+# are serialized, so seq order is commit order and the cursor is the last seq.
+# On Postgres seq is handed out at insert time, and a slow transaction can
+# commit a lower seq after a client has read past it. There each row carries
+# its transaction id, the feed is read in (txid, seq) order, and only rows of
+# transactions older than the oldest one still running are returned. Every
+# transaction below that bound has finished, so no change can later appear
+# behind a cursor.
+
+def _commit_ordered(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _xid(value):
+    # xid8 has no cast to bigint; its text form does.
+    return cast(cast(value, Text), BigInteger)
+
+def _log(db: Session, rows):
+    if rows:
+        stmt = insert(models.change_log)
+        if _commit_ordered(db):
+            stmt = stmt.values(txid=_xid(func.pg_current_xact_id()))
+        db.execute(stmt, rows)
+        events.stage(db, rows)
+
+def record(db: Session, entity: schemas.ChangeEntity, entity_id: int, op: schemas.ChangeOp, user_ids: Optional[Iterable[int]] = None):
+    """Log one change; user_ids=None makes it visible to everyone."""
+    targets = [None] if user_ids is None else sorted(set(user_ids))
+    _log(db, [{"user_id": user_id, "entity": entity.value, "entity_id": entity_id, "op": op.value} for user_id in targets])
+
+def record_task(db: Session, task: models.Task, op: schemas.ChangeOp = schemas.ChangeOp.UPSERT, user_ids=None):
+    if user_ids is None:
+        user_ids = {task.user_id} | {participant.id for participant in task.participants}
+    record(db, schemas.ChangeEntity.TASK, task.id, op, user_ids)
+
+def record_tasks(db: Session, task_ids: Iterable[int], user_id: int):
+    """Upserts for freshly created tasks, which only their owner can see yet."""
+    _log(db, [{"user_id": user_id, "entity": TASK, "entity_id": task_id, "op": UPSERT} for task_id in task_ids])
+
+def record_label(db: Session, label_id: int, op: schemas.ChangeOp = schemas.ChangeOp.UPSERT):
+    record(db, schemas.ChangeEntity.LABEL, label_id, op)
+
+def record_labels(db: Session, label_ids: Iterable[int]):
+    _log(db, [{"user_id": None, "entity": LABEL, "entity_id": label_id, "op": UPSERT} for label_id in label_ids])
+
+def encode_cursor(*key: int) -> str:
+    """Cursor for a feed position: (seq,) on SQLite, (txid, seq) on Postgres."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        key = tuple(int(value) for value in json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if len(key) not in (1, 2):
+        raise ValueError("Invalid cursor")
+    return key
+
+def get_changes(db: Session, user_id: int, since: Optional[str], limit: int = 500):
+    """Changes visible to the user after `since`, oldest first, latest op per entity.
+
+    Without a cursor, or with one older than the retained log, nothing is
+    returned and resync_required is set, with a cursor to resume from after
+    the client has refetched its tasks.
+    """
+    log = models.change_log
+    limit = max(1, min(limit, CHANGE_FEED_MAX_BATCH))
+    ordered = _commit_ordered(db)
+    key = (log.c.txid, log.c.seq) if ordered else (log.c.seq,)
+    # Separate subqueries: SQLite answers a lone min() or max() from the rowid
+    # ends, but scans for both in one select.
+    bounds = [select(func.min(log.c.seq)).scalar_subquery(), select(func.max(log.c.seq)).scalar_subquery()]
+    if ordered:
+        bounds.append(_xid(func.pg_snapshot_xmin(func.pg_current_snapshot())))
+    oldest, latest, *horizon = db.execute(select(*bounds)).one()
+    after = decode_cursor(since) if since else None
+    # prune() always keeps the newest row, so oldest is only None for an empty
+    # log. The seq part of either cursor tells whether rows past it were pruned.
+    # A cursor from the other key shape (the database changed) also resyncs.
+    if after is None or len(after) != len(key) or (oldest is not None and after[-1] < oldest - 1):
+        # On Postgres, resume after every transaction below the horizon: all
+        # their rows are at or below `latest`, the rest are still to come.
+        resume = (horizon[0] - 1, latest or 0) if ordered else (latest or 0,)
+        return {"changes": [], "next_cursor": encode_cursor(*resume), "has_more": False, "resync_required": True}
+
+    conditions = [or_(log.c.user_id == user_id, log.c.user_id.is_(None))]
+    if ordered:
+        conditions += [tuple_(*key) > tuple_(*after), log.c.txid < horizon[0]]
+    else:
+        conditions.append(log.c.seq > after[0])
+    rows = db.execute(
+        select(*key, log.c.entity, log.c.entity_id, log.c.op)
+        .where(*conditions)
+        .order_by(*key)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Several rows for one entity collapse into the last one, placed at its seq.
+    last = {}
+    for row in rows:
+        last.pop((row.entity, row.entity_id), None)
+        last[(row.entity, row.entity_id)] = row
+
+    task_ids = [r.entity_id for r in last.values() if r.entity == TASK and r.op == UPSERT]
+    label_ids = [r.entity_id for r in last.values() if r.entity == LABEL and r.op == UPSERT]
+    current = {TASK: {}, LABEL: {}}
+    if task_ids:
+        query = db.query(models.Task).filter(models.Task.id.in_(task_ids), visible_to(user_id))
+        current[TASK] = {task.id: task for task in taskService.with_profile(query).all()}
+    if label_ids:
+        current[LABEL] = {label.id: label for label in db.query(models.Label).filter(models.Label.id.in_(label_ids))}
+
+    changes = []
+    for (entity, entity_id), row in last.items():
+        change = {"seq": row.seq, "entity": entity, "entity_id": entity_id, "op": row.op}
+        if row.op == UPSERT:
+            obj = current[entity].get(entity_id)
+            if obj is None:
+                # Deleted, or hidden from this user, by a change past this batch.
+                change["op"] = schemas.ChangeOp.DELETE.value
+            elif entity == TASK and not obj.is_active:
+                change["op"] = schemas.ChangeOp.DEACTIVATE.value
+            else:
+                change[entity] = obj
+        changes.append(change)
+
+    next_key = tuple(rows[-1][:len(key)]) if rows else after
+    return {"changes": changes, "next_cursor": encode_cursor(*next_key), "has_more": has_more, "resync_required": False}
+
+@jobs.handler("change_log.prune")
+def prune(db: Session, older_than_days: float = CHANGE_LOG_RETENTION_DAYS) -> int:
+    """Delete log rows older than the retention window; the newest row always stays."""
+    log = models.change_log
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    latest = db.scalar(select(func.max(log.c.seq)))
+    if latest is None:
+        return 0
+    result = db.execute(delete(log).where(log.c.created_at < cutoff, log.c.seq < latest))
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,85 @@
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from backend.Model import models
+from .. import jobs
+
+# Maintains models.user_label_counts: for every user, how many of the tasks
+# they own or participate in carry each label. Services call the adjust
+# helpers inside their own transaction, before committing, whenever a label
+# is attached/detached, a task is deleted or a participant is added/removed.
+
+def task_members(task: models.Task):
+    return {task.user_id} | {participant.id for participant in task.participants}
+
+def adjust(db: Session, user_ids: Iterable[int], label_ids: Iterable[int], delta: int):
+    label_ids = list(label_ids)
+    apply_deltas(db, Counter({(user_id, label_id): delta for user_id in user_ids for label_id in label_ids}))
+
+def apply_deltas(db: Session, deltas: Counter):
+    rows = [
+        {"user_id": user_id, "label_id": label_id, "count": delta}
+        for (user_id, label_id), delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    table = models.user_label_counts
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.label_id],
+            set_={"count": table.c.count + stmt.excluded.count},
+        ),
+        rows,
+    )
+    db.execute(delete(table).where(
+        table.c.count <= 0,
+        table.c.user_id.in_({row["user_id"] for row in rows}),
+    ))
+
+def remove_label(db: Session, label_id: int):
+    db.execute(delete(models.user_label_counts).where(models.user_label_counts.c.label_id == label_id))
+
+def actual_counts(user_id: Optional[int] = None):
+    """The counts computed from task_labels and task membership (the source of truth)."""
+    owners = select(models.Task.id.label("task_id"), models.Task.user_id.label("user_id"))
+    participants = select(models.task_participants.c.task_id, models.task_participants.c.user_id)
+    if user_id is not None:
+        owners = owners.where(models.Task.user_id == user_id)
+        participants = participants.where(models.task_participants.c.user_id == user_id)
+    members = union(owners, participants).subquery()
+    return select(
+        members.c.user_id, models.task_labels.c.label_id, func.count().label("count")
+    ).join_from(
+        models.task_labels, members, members.c.task_id == models.task_labels.c.task_id
+    ).group_by(members.c.user_id, models.task_labels.c.label_id)
+
+@jobs.handler("label_counts.rebuild")
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    table = models.user_label_counts
+    clear = delete(table)
+    if user_id is not None:
+        clear = clear.where(table.c.user_id == user_id)
+    db.execute(clear)
+    result = db.execute(insert(table).from_select(["user_id", "label_id", "count"], actual_counts(user_id)))
+    db.commit()
+    return result.rowcount
+
+def check(db: Session, user_id: Optional[int] = None):
+    """Return (user_id, label_id, stored, actual) for every row that disagrees."""
+    table = models.user_label_counts
+    stored_query = select(table.c.user_id, table.c.label_id, table.c.count)
+    if user_id is not None:
+        stored_query = stored_query.where(table.c.user_id == user_id)
+    stored = {(u, l): c for u, l, c in db.execute(stored_query)}
+    actual = {(u, l): c for u, l, c in db.execute(actual_counts(user_id))}
+    return sorted(
+        (u, l, stored.get((u, l), 0), actual.get((u, l), 0))
+        for u, l in stored.keys() | actual.keys()
+        if stored.get((u, l), 0) != actual.get((u, l), 0)
+    )
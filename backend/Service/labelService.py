@@ -1,12 +1,30 @@
+import os
 import random
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, or_
+from typing import Dict, Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from backend.Model import models
 from .. import schemas
+from ..cache import TTLCache
+from . import changeService, labelCountService, taskService
+
+LABEL_CACHE_SIZE = int(os.getenv("LABEL_CACHE_SIZE", 4096))
+LABEL_CACHE_TTL = float(os.getenv("LABEL_CACHE_TTL", 300))
+
+# name -> id for labels known to be committed; see resolve_label_ids.
+label_id_cache = TTLCache("label_ids", maxsize=LABEL_CACHE_SIZE, ttl=LABEL_CACHE_TTL)
+
+AVAILABLE_LIGHT_COLORS = ["#FFCDD2", "#F8BBD0", "#E1BEE7", "#D1C4E9", "#C5CAE9",
+                          "#BBDEFB", "#B3E5FC", "#B2EBF2", "#B2DFDB", "#C8E6C9",
+                          "#DCEDC8", "#F0F4C3", "#FFF9C4", "#FFECB3", "#FFE0B2",
+                          "#FFCCBC", "#D7CCC8", "#F5F5F5", "#CFD8DC"]
 
 def create_label(db: Session, label: schemas.LabelCreate):
     db_label = models.Label(**label.model_dump())
     db.add(db_label)
+    db.flush()
+    changeService.record_label(db, db_label.id)
     db.commit()
     db.refresh(db_label)
     return db_label
@@ -23,77 +41,120 @@ def update_label(db: Session, label_id: int, label: schemas.LabelUpdate):
         update_data = label.model_dump(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_label, key, value)
+        changeService.record_label(db, label_id)
         db.commit()
+        invalidate_label_cache(label_id)
         db.refresh(db_label)
     return db_label
 
 def delete_label(db: Session, label_id: int):
     db_label = get_label(db, label_id)
     if db_label:
+        labelCountService.remove_label(db, label_id)
+        taskService.touch_tasks(db, select(models.task_labels.c.task_id).where(models.task_labels.c.label_id == label_id))
+        changeService.record_label(db, label_id, schemas.ChangeOp.DELETE)
         db.delete(db_label)
         db.commit()
+        invalidate_label_cache(label_id)
     return db_label
 
+def invalidate_label_cache(label_id: int):
+    label_id_cache.invalidate_where(lambda name, cached_id: cached_id == label_id)
+
+def insert_ignoring_duplicates(db: Session, table):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+def resolve_label_ids(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Map label names to ids, creating missing labels, without committing.
+
+    Uncached names cost one SELECT ... IN; names that still do not exist are
+    created with one INSERT ... ON CONFLICT DO NOTHING (a concurrent request
+    may create the same name), read back with one more SELECT and announced
+    in the change feed with one INSERT.
+    """
+    names = list(dict.fromkeys(names))
+    ids = {}
+    missing = []
+    for name in names:
+        label_id = label_id_cache.get(name)
+        if label_id is None:
+            missing.append(name)
+        else:
+            ids[name] = label_id
+    if not missing:
+        return ids
+
+    found = dict(db.execute(
+        select(models.Label.name, models.Label.id).where(models.Label.name.in_(missing))
+    ).all())
+    # Only rows that existed before this transaction are cached, so a rollback
+    # cannot leave ids of labels that were never committed in the cache.
+    for name, label_id in found.items():
+        label_id_cache.set(name, label_id)
+    ids.update(found)
+
+    new_names = [name for name in missing if name not in found]
+    if new_names:
+        db.execute(
+            insert_ignoring_duplicates(db, models.Label.__table__),
+            [{"name": name, "color": random.choice(AVAILABLE_LIGHT_COLORS)} for name in new_names],
+        )
+        created = dict(db.execute(
+            select(models.Label.name, models.Label.id).where(models.Label.name.in_(new_names))
+        ).all())
+        changeService.record_labels(db, created.values())
+        ids.update(created)
+    return ids
+
+def get_labels_version(db: Session):
+    return tuple(db.execute(
+        select(func.count(), func.max(models.Label.id), func.max(func.coalesce(models.Label.updated_at, models.Label.created_at)))
+    ).one())
+
+def get_label_version(db: Session, label_id: int):
+    return db.execute(
+        select(func.coalesce(models.Label.updated_at, models.Label.created_at)).where(models.Label.id == label_id)
+    ).scalar_one_or_none()
+
 def get_label_by_name(db: Session, name: str):
     return db.query(models.Label).filter(models.Label.name == name).first()
 
 def get_labels_with_usage_count(db: Session, user_id: int):
-    return db.query(
-        models.Label,
-        func.count(models.task_labels.c.task_id).label('count')
-    ).join(models.task_labels)\
-     .join(models.Task)\
-     .outerjoin(models.task_participants, models.Task.id == models.task_participants.c.task_id)\
-     .filter(
-         or_(
-             models.Task.user_id == user_id,
-             models.task_participants.c.user_id == user_id
-         )
-     )\
-     .group_by(models.Label.id).all()
+    counts = models.user_label_counts
+    return db.query(models.Label, counts.c.count)\
+     .join(counts, counts.c.label_id == models.Label.id)\
+     .filter(counts.c.user_id == user_id)\
+     .order_by(counts.c.label_id).all()
 
 def add_label_to_task(db: Session, task_id: int, label_name: str, user_id: int):
-    task = db.query(models.Task).outerjoin(models.task_participants).filter(
-        models.Task.id == task_id,
-        or_(
-            models.Task.user_id == user_id,
-            models.task_participants.c.user_id == user_id
-        )
-    ).first()
+    task = taskService.get_task(db, task_id, user_id)
     
     if not task:
         return None
 
-    available_light_colors = ["#FFCDD2", "#F8BBD0", "#E1BEE7", "#D1C4E9", "#C5CAE9",
-                              "#BBDEFB", "#B3E5FC", "#B2EBF2", "#B2DFDB", "#C8E6C9",
-                              "#DCEDC8", "#F0F4C3", "#FFF9C4", "#FFECB3", "#FFE0B2",
-                              "#FFCCBC", "#D7CCC8", "#F5F5F5", "#CFD8DC"]
-    label = get_label_by_name(db, name=label_name)
-    if not label:
-        label = models.Label(name=label_name, color=random.choice(available_light_colors))
-        db.add(label)
-        db.commit()
-        db.refresh(label)
-
-    if label not in task.labels:
-        task.labels.append(label)
-        db.commit()
-        db.refresh(task)
-        
-    return task
+    label_id = resolve_label_ids(db, [label_name])[label_name]
+    if label_id not in {label.id for label in task.labels}:
+        db.execute(insert(models.task_labels).values(task_id=task.id, label_id=label_id))
+        task.updated_at = models.utcnow()
+        labelCountService.adjust(db, labelCountService.task_members(task), [label_id], 1)
+        changeService.record_task(db, task)
+    db.commit()
+    return taskService.reload_task(db, task)
 
 def remove_label_from_task(db: Session, task_id: int, label_id: int, user_id: int):
-    task = db.query(models.Task).outerjoin(models.task_participants).filter(
-        models.Task.id == task_id,
-        or_(
-            models.Task.user_id == user_id,
-            models.task_participants.c.user_id == user_id
-        )
-    ).first()
+    task = taskService.get_task(db, task_id, user_id)
     
     label = get_label(db, label_id)
     if task and label and label in task.labels:
         task.labels.remove(label)
+        task.updated_at = models.utcnow()
+        labelCountService.adjust(db, labelCountService.task_members(task), [label.id], -1)
+        changeService.record_task(db, task)
         db.commit()
-        db.refresh(task)
+        task = taskService.reload_task(db, task)
     return task
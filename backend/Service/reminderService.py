@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import and_, exists, or_, select
+from sqlalchemy.orm import Session
+
+from backend.Model import models
+from . import taskService
+from .labelService import insert_ignoring_duplicates
+
+# Queries behind the reminder scheduler (backend/reminders.py). Deadlines are
+# read in (due_date, id) order from ix_tasks_due_date, a window at a time, so
+# no call touches more than `limit` upcoming tasks.
+
+def _pending():
+    return and_(models.Task.is_active.is_(True), models.Task.status != models.TaskStatus.DONE)
+
+def upcoming(db: Session, after: Tuple[datetime, int], before: datetime, limit: int) -> List[Tuple[int, datetime]]:
+    """(task_id, due_date) of open tasks due after the `after` key and before `before`, soonest first.
+
+    Deadlines that already have a reminder are skipped (a probe of the
+    reminders unique key), so reloading a window after a restart only
+    returns what was missed.
+    """
+    due, task_id = after
+    task = models.Task
+    sent = models.reminders.c
+    rows = db.execute(
+        select(task.id, task.due_date)
+        .where(
+            # The redundant >= keeps this one ordered range on ix_tasks_due_date;
+            # the OR alone is planned as two ranges and a sort of the window.
+            task.due_date >= due,
+            task.due_date < before,
+            or_(task.due_date > due, task.id > task_id),
+            _pending(),
+            ~exists().where(sent.task_id == task.id, sent.due_date == task.due_date),
+        )
+        .order_by(task.due_date, task.id)
+        .limit(limit)
+    ).all()
+    return [(task_id, taskService.to_utc(due_date)) for task_id, due_date in rows]
+
+def record(db: Session, fired: Iterable[Tuple[int, datetime]]) -> int:
+    """Write reminders for fired (task_id, due_date) pairs in one statement.
+
+    Pairs whose task has since been deleted, closed or given another due date
+    are dropped, so a stale schedule entry never produces a reminder. Pairs
+    already recorded are ignored. Returns the number of reminders kept.
+    """
+    fired = set(fired)
+    if not fired:
+        return 0
+    task = models.Task
+    current = {
+        task_id: (user_id, taskService.to_utc(due_date))
+        for task_id, user_id, due_date in db.execute(
+            select(task.id, task.user_id, task.due_date).where(task.id.in_({task_id for task_id, _ in fired}), _pending())
+        )
+    }
+    rows = [
+        {"task_id": task_id, "user_id": current[task_id][0], "due_date": due_date}
+        for task_id, due_date in sorted(fired)
+        if task_id in current and current[task_id][1] == due_date
+    ]
+    if rows:
+        db.execute(insert_ignoring_duplicates(db, models.reminders), rows)
+    db.commit()
+    return len(rows)
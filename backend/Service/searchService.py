@@ -0,0 +1,104 @@
+import os
+import re
+
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.orm import Session
+
+from backend.Model import models
+from .. import jobs
+from . import taskService
+from .visibilityService import visible_to
+
+# Shorter last words match exactly: a one- or two-letter prefix expands to a
+# large share of the vocabulary and costs a scan of most of the index.
+SEARCH_MIN_PREFIX = int(os.getenv("SEARCH_MIN_PREFIX", 3))
+
+# bm25 column weights for the FTS5 table: a title hit outranks a description
+# hit, and the members column only filters.
+TITLE_WEIGHT, DESCRIPTION_WEIGHT, MEMBERS_WEIGHT = 10.0, 1.0, 0.0
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+def parse_terms(q: str):
+    terms = _TERM.findall(q or "")
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    return terms
+
+# Every term must match, the last one as a prefix so results follow the
+# user's typing. Terms are plain words, and quoting keeps them from being read
+# as FTS5 operators (NEAR, OR, column filters).
+
+def _prefix(terms):
+    return len(terms[-1]) >= SEARCH_MIN_PREFIX
+
+def _sqlite_match(terms, user_id: int):
+    words = " ".join(f'"{term}"' for term in terms) + ("*" if _prefix(terms) else "")
+    return f'{{title description}} : ({words}) AND members : "u{user_id}"'
+
+def _postgres_query(terms):
+    return " & ".join(terms) + (":*" if _prefix(terms) else "")
+
+def _ranked(db: Session, terms, user_id: int):
+    """Subquery of (task_id, rank) for matching tasks, best match lowest."""
+    if db.get_bind().dialect.name == "postgresql":
+        query = func.to_tsquery("english", _postgres_query(terms))
+        vector = literal_column("tasks.search_vector")
+        return (
+            select(models.Task.id.label("task_id"), (-func.ts_rank_cd(vector, query)).label("rank"))
+            .where(vector.op("@@")(query))
+            .subquery()
+        )
+    fts = literal_column("tasks_fts")
+    return (
+        select(
+            literal_column("tasks_fts.rowid").label("task_id"),
+            func.bm25(fts, TITLE_WEIGHT, DESCRIPTION_WEIGHT, MEMBERS_WEIGHT).label("rank"),
+        )
+        .select_from(text("tasks_fts"))
+        .where(fts.op("MATCH")(_sqlite_match(terms, user_id)))
+        .subquery()
+    )
+
+def search_tasks(db: Session, user_id: int, q: str, skip: int = 0, limit: int = 20, is_active: bool = True):
+    """Visible tasks matching every word of `q`, best match first.
+
+    Offset pagination: ranks depend on index-wide statistics and move with
+    every write, so a keyset cursor over them would skip or repeat rows.
+    """
+    ranked = _ranked(db, parse_terms(q), user_id)
+    query = (
+        db.query(models.Task)
+        .join(ranked, models.Task.id == ranked.c.task_id)
+        # Matches are already narrowed to the user's tasks by the index, so each
+        # survivor is checked in place rather than against the whole visible set.
+        .filter(visible_to(user_id, strategy="exists"), models.Task.is_active == is_active)
+        .order_by(ranked.c.rank, models.Task.id)
+        .offset(skip)
+        .limit(limit + 1)
+    )
+    tasks = taskService.with_profile(query).all()
+    return {"tasks": tasks[:limit], "has_more": len(tasks) > limit}
+
+_SQLITE_REINDEX = """
+INSERT INTO tasks_fts(rowid, title, description, members)
+SELECT tasks.id, tasks.title, tasks.description, 'u' || tasks.user_id || coalesce(' ' || shared.members, '')
+FROM tasks LEFT JOIN (
+    SELECT task_id, group_concat('u' || user_id, ' ') AS members FROM task_participants GROUP BY task_id
+) AS shared ON shared.task_id = tasks.id
+"""
+
+@jobs.handler("search.reindex")
+def reindex(db: Session) -> int:
+    """Rebuild the search index from the tasks table; returns the task count."""
+    dialect = db.get_bind().dialect.name
+    for statement in models.TASK_SEARCH_DDL.get(dialect, ()):
+        db.execute(text(statement))
+    if dialect == "sqlite":
+        db.execute(text("DELETE FROM tasks_fts"))
+        db.execute(text(_SQLITE_REINDEX))
+        db.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('optimize')"))
+    elif dialect == "postgresql":
+        db.execute(text("REINDEX INDEX ix_tasks_search_vector"))
+    db.commit()
+    return db.scalar(select(func.count()).select_from(models.Task))
@@ -1,43 +1,366 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+import base64
+import itertools
+import json
+import os
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone
+from typing import Collection, Iterable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload, selectinload
+from sqlalchemy import and_, case, func, insert, or_, select, update
 from backend.Model import models
-from .. import schemas
-from . import labelService, userService
-
-def get_task(db: Session, task_id: int, user_id: int):
-    return db.query(models.Task).outerjoin(models.task_participants).filter(
-        models.Task.id == task_id,
-        or_(
-            models.Task.user_id == user_id,
-            models.task_participants.c.user_id == user_id
-        )
+from .. import reminders, schemas
+from ..cache import TTLCache
+from . import changeService, labelCountService, labelService, userService
+from .visibilityService import visible_to
+
+TASK_TOTAL_CACHE_TTL = float(os.getenv("TASK_TOTAL_CACHE_TTL", 30))
+TASK_EXPORT_BATCH_SIZE = int(os.getenv("TASK_EXPORT_BATCH_SIZE", 500))
+TASK_BULK_MAX_ITEMS = int(os.getenv("TASK_BULK_MAX_ITEMS", 500))
+TASK_FILTER_MAX_LABELS = int(os.getenv("TASK_FILTER_MAX_LABELS", 20))
+TASK_STATS_CACHE_TTL = float(os.getenv("TASK_STATS_CACHE_TTL", 60))
+_total_cache = TTLCache("task_totals", maxsize=4096, ttl=TASK_TOTAL_CACHE_TTL)
+_stats_cache = TTLCache("task_stats", maxsize=4096, ttl=TASK_STATS_CACHE_TTL)
+
+# Inclusive progress ranges of the stats histogram.
+PROGRESS_BUCKETS = ((0, 0), (1, 25), (26, 50), (51, 75), (76, 99), (100, 100))
+
+SORT_COLUMNS = {
+    schemas.TaskSortKey.CREATED_AT: models.Task.created_at,
+    schemas.TaskSortKey.DUE_DATE: models.Task.due_date,
+}
+
+# Loader options for task queries, keyed by what the caller serializes.
+# "full" covers everything schemas.Task renders, so a page of tasks costs a
+# fixed number of statements instead of one lazy load per relationship per row.
+TASK_LOAD_PROFILES = {
+    "full": (
+        joinedload(models.Task.owner),
+        selectinload(models.Task.labels),
+        selectinload(models.Task.participants),
+    ),
+    "none": (),
+}
+
+_TASK_RELATIONSHIPS = {
+    "owner": (models.Task.owner, joinedload),
+    "labels": (models.Task.labels, selectinload),
+    "participants": (models.Task.participants, selectinload),
+}
+_USER_COLUMNS = (models.User.id, models.User.email, models.User.first_name, models.User.last_name)
+
+def fields_profile(fields: Collection[str], *required_columns):
+    """Loader options fetching only the given schemas.Task fields.
+
+    Unrequested columns are deferred and unrequested relationships are never
+    queried; touching either raises instead of lazy-loading. Users come back
+    with just the columns schemas.User renders.
+    """
+    columns = {models.Task.id, *required_columns}
+    options = []
+    for name in fields:
+        if name in _TASK_RELATIONSHIPS:
+            relationship, loader = _TASK_RELATIONSHIPS[name]
+            load = loader(relationship)
+            options.append(load.load_only(*_USER_COLUMNS) if name != "labels" else load)
+        else:
+            columns.add(getattr(models.Task, name))
+    skipped = [raiseload(relationship) for name, (relationship, _) in _TASK_RELATIONSHIPS.items() if name not in fields]
+    return (load_only(*columns, raiseload=True), *options, *skipped)
+
+def with_profile(query, profile="full"):
+    # profile is a TASK_LOAD_PROFILES name or options from fields_profile().
+    options = TASK_LOAD_PROFILES[profile] if isinstance(profile, str) else profile
+    return query.options(*options)
+
+def reload_task(db: Session, task: models.Task, profile: str = "full"):
+    # Used after a commit instead of db.refresh() so the returned task comes back
+    # with its relationships already loaded for serialization.
+    query = db.query(models.Task).filter(models.Task.id == task.id).populate_existing()
+    return with_profile(query, profile).one()
+
+def get_task(db: Session, task_id: int, user_id: int, profile: str = "full"):
+    query = db.query(models.Task).filter(models.Task.id == task_id, visible_to(user_id))
+    return with_profile(query, profile).first()
+
+def encode_cursor(sort: schemas.TaskSortKey, value: Optional[datetime], task_id: int) -> str:
+    payload = [sort.value, value.isoformat() if value else None, task_id]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: schemas.TaskSortKey):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, value, task_id = json.loads(raw)
+        if key != sort.value:
+            raise ValueError("Cursor was issued for a different sort order")
+        return (datetime.fromisoformat(value) if value else None), int(task_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def _after_cursor(column, value, task_id: int):
+    # Rows strictly after (value, id) in "column ASC NULLS LAST, id ASC" order.
+    if value is None:
+        return and_(column.is_(None), models.Task.id > task_id)
+    return or_(
+        column > value,
+        and_(column == value, models.Task.id > task_id),
+        column.is_(None),
+    )
+
+def _label_stamp():
+    return select(func.max(models.Label.updated_at)).scalar_subquery()
+
+def get_tasks_version(db: Session, user_id: int):
+    """A value that changes whenever any task the user can see, or any label, changes.
+
+    Adding and removing tasks moves the count or max id; edits, label links and
+    participant changes touch updated_at. One aggregate, no rows are loaded.
+    """
+    return tuple(db.execute(
+        select(
+            func.count(),
+            func.max(func.coalesce(models.Task.updated_at, models.Task.created_at)),
+            func.max(models.Task.id),
+            _label_stamp(),
+        ).where(visible_to(user_id))
+    ).one())
+
+def get_task_version(db: Session, task_id: int, user_id: int):
+    """Like get_tasks_version for one task; None when the task is not visible."""
+    row = db.execute(
+        select(func.coalesce(models.Task.updated_at, models.Task.created_at), _label_stamp())
+        .where(models.Task.id == task_id, visible_to(user_id))
     ).first()
+    return tuple(row) if row is not None else None
+
+def touch_tasks(db: Session, task_ids):
+    """Bump updated_at for tasks whose labels or participants changed (ids or a subquery)."""
+    db.execute(
+        update(models.Task.__table__).where(models.Task.id.in_(task_ids)).values(updated_at=models.utcnow())
+    )
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Naive values are taken as UTC, the zone the app writes timestamps in
+    # (SQLite hands them back naive).
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def _due_window(preset: schemas.DuePreset, tz: str, now: datetime):
+    """(after, before) bounds of a due-date preset, in UTC."""
+    if preset == schemas.DuePreset.OVERDUE:
+        # Whole minutes, so the bound (and the ETag built from it) holds for a minute.
+        return None, now.replace(second=0, microsecond=0)
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {tz}")
+    today = now.astimezone(zone).date()
+    if preset == schemas.DuePreset.TODAY:
+        start, end = today, today + timedelta(days=1)
+    else:
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=7)
+    # Midnights are built per day so a DST change inside the window is honoured.
+    return to_utc(datetime.combine(start, time(), zone)), to_utc(datetime.combine(end, time(), zone))
+
+def build_task_filter(
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    due: Optional[schemas.DuePreset] = None,
+    tz: str = "UTC",
+    label_ids: Iterable[int] = (),
+    label_match: schemas.LabelMatch = schemas.LabelMatch.ANY,
+    now: Optional[datetime] = None,
+) -> schemas.TaskFilter:
+    """Resolve request parameters into a TaskFilter; raises ValueError on bad input.
+
+    A preset narrows any explicit due range rather than replacing it.
+    """
+    due_after, due_before = to_utc(due_after), to_utc(due_before)
+    if due:
+        after, before = _due_window(due, tz, now or models.utcnow())
+        due_after = max(filter(None, (due_after, after)), default=None)
+        due_before = min(filter(None, (due_before, before)), default=None)
+    label_ids = tuple(sorted(set(label_ids)))
+    if len(label_ids) > TASK_FILTER_MAX_LABELS:
+        raise ValueError(f"At most {TASK_FILTER_MAX_LABELS} labels per filter")
+    return schemas.TaskFilter(
+        due_after=due_after,
+        due_before=due_before,
+        created_after=to_utc(created_after),
+        created_before=to_utc(created_before),
+        exclude_done=due == schemas.DuePreset.OVERDUE,
+        label_ids=label_ids,
+        label_match=label_match,
+    )
+
+def _labelled(label_ids):
+    links = models.task_labels.c
+    return models.Task.id.in_(select(links.task_id).where(links.label_id.in_(label_ids)))
 
-def get_tasks(db: Session, user_id: int, skip: int = 0, limit: int = 100, status: models.TaskStatus = None, is_active: bool = True):
-    query = db.query(models.Task).outerjoin(models.task_participants).filter(
-        or_(
-            models.Task.user_id == user_id,
-            models.task_participants.c.user_id == user_id
-        )
-    ).distinct()
+def apply_task_filter(query, task_filter: schemas.TaskFilter):
+    ranges = (
+        (models.Task.due_date, task_filter.due_after, task_filter.due_before),
+        (models.Task.created_at, task_filter.created_after, task_filter.created_before),
+    )
+    for column, after, before in ranges:
+        if after is not None:
+            query = query.filter(column >= after)
+        if before is not None:
+            query = query.filter(column < before)
+    if task_filter.exclude_done:
+        query = query.filter(models.Task.status != models.TaskStatus.DONE)
+    # Semi-joins on task_labels (label_id, task_id): "any" is one IN over all
+    # the labels, "all" one IN per label, so no join multiplies the rows.
+    if task_filter.label_ids:
+        if task_filter.label_match == schemas.LabelMatch.ALL:
+            for label_id in task_filter.label_ids:
+                query = query.filter(_labelled([label_id]))
+        else:
+            query = query.filter(_labelled(task_filter.label_ids))
+    return query
+
+def get_tasks(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    status: models.TaskStatus = None,
+    is_active: bool = True,
+    after: Optional[str] = None,
+    sort: schemas.TaskSortKey = schemas.TaskSortKey.CREATED_AT,
+    total_mode: schemas.TotalMode = schemas.TotalMode.EXACT,
+    profile: str = "full",
+    fields: Optional[Collection[str]] = None,
+    task_filter: Optional[schemas.TaskFilter] = None,
+):
+    query = db.query(models.Task).filter(visible_to(user_id))
     
     if is_active is not None:
         query = query.filter(models.Task.is_active == is_active)
     if status:
         query = query.filter(models.Task.status == status)
+    if task_filter is not None:
+        query = apply_task_filter(query, task_filter)
     
-    total = query.count()
-    tasks = query.offset(skip).limit(limit).all()
-    return {"tasks": tasks, "total": total}
-
-def get_all_user_tasks(db: Session, user_id: int, is_active: bool = True):
-    return db.query(models.Task).outerjoin(models.task_participants).filter(
-        or_(
-            models.Task.user_id == user_id,
-            models.task_participants.c.user_id == user_id
-        ),
-        models.Task.is_active == is_active
-    ).distinct().all()
+    if total_mode == schemas.TotalMode.NONE:
+        total = None
+    elif total_mode == schemas.TotalMode.CACHED:
+        cache_key = (user_id, status, is_active, task_filter)
+        total = _total_cache.get(cache_key)
+        if total is None:
+            total = query.count()
+            _total_cache.set(cache_key, total)
+    else:
+        total = query.count()
+
+    column = SORT_COLUMNS[sort]
+    if fields:
+        # The sort column is needed for next_cursor even if it is not rendered.
+        profile = fields_profile(fields, column)
+    if after:
+        value, last_id = decode_cursor(after, sort)
+        query = query.filter(_after_cursor(column, value, last_id))
+        skip = 0
+
+    # Fetch one extra row to learn whether another page exists.
+    query = query.order_by(column.asc().nulls_last(), models.Task.id.asc())
+    rows = with_profile(query, profile).offset(skip).limit(limit + 1).all()
+    tasks = rows[:limit]
+    next_cursor = None
+    if tasks and len(rows) > limit:
+        last = tasks[-1]
+        next_cursor = encode_cursor(sort, getattr(last, sort.value), last.id)
+    return {"tasks": tasks, "total": total, "next_cursor": next_cursor}
+
+def get_all_user_tasks(
+    db: Session, user_id: int, is_active: bool = True, profile: str = "full", fields: Optional[Collection[str]] = None
+):
+    query = db.query(models.Task).filter(visible_to(user_id), models.Task.is_active == is_active)
+    return with_profile(query, fields_profile(fields) if fields else profile).all()
+
+def iter_user_tasks(db: Session, user_id: int, is_active: bool = True, batch_size: int = None, profile: str = "full"):
+    """Yield the user's visible tasks in fixed-size batches from a server-side cursor.
+
+    Each batch has its relationships loaded by the profile (selectin loads run
+    per batch), so memory stays bounded by batch_size rather than task count.
+    """
+    stmt = select(models.Task).where(
+        visible_to(user_id), models.Task.is_active == is_active
+    ).order_by(models.Task.id)
+    stmt = with_profile(stmt, profile).execution_options(yield_per=batch_size or TASK_EXPORT_BATCH_SIZE)
+    for batch in db.execute(stmt).scalars().partitions():
+        yield batch
+        for task in batch:
+            db.expunge(task)
+
+# Stats entries are keyed by a per-user generation that writers bump after
+# committing. A read that raced a write stores its result under the old
+# generation, where nothing looks it up again, instead of overwriting the
+# invalidation. Other workers keep their entries until TASK_STATS_CACHE_TTL.
+_stats_generations = {}
+_next_generation = itertools.count(1)
+
+def invalidate_task_stats(user_ids: Iterable[int]):
+    for user_id in user_ids:
+        _stats_generations[user_id] = next(_next_generation)
+
+def _count(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+def _in_window(window):
+    after, before = window
+    return and_(models.Task.due_date >= after, models.Task.due_date < before)
+
+def get_task_stats(db: Session, user_id: int, is_active: bool = True, tz: str = "UTC", now: Optional[datetime] = None):
+    """Dashboard counts over the user's visible tasks, from one aggregate query.
+
+    Overdue and the today/this-week windows follow the DuePreset definitions,
+    evaluated in `tz`; raises ValueError for an unknown zone. Cached per user
+    until one of their tasks is written.
+    """
+    now = to_utc(now or models.utcnow()).replace(second=0, microsecond=0)
+    today = _due_window(schemas.DuePreset.TODAY, tz, now)
+    this_week = _due_window(schemas.DuePreset.THIS_WEEK, tz, now)
+    # The minute is part of the key: overdue moves with the clock even when nothing is written.
+    cache_key = (user_id, _stats_generations.get(user_id), is_active, tz, now)
+    stats = _stats_cache.get(cache_key)
+    if stats is not None:
+        return stats
+
+    task = models.Task
+    not_done = task.status != models.TaskStatus.DONE
+    row = db.execute(
+        select(
+            func.count(),
+            *(_count(task.status == status) for status in models.TaskStatus),
+            _count(and_(task.due_date < now, not_done)),
+            _count(_in_window(today)),
+            _count(and_(_in_window(today), not_done)),
+            _count(_in_window(this_week)),
+            _count(and_(_in_window(this_week), not_done)),
+            *(_count(task.progress.between(low, high)) for low, high in PROGRESS_BUCKETS),
+        ).where(visible_to(user_id), task.is_active == is_active)
+    ).one()
+    # sum() over no rows is NULL.
+    total, *counts = (value or 0 for value in row)
+    by_status = dict(zip(models.TaskStatus, counts))
+    overdue, due_today, open_today, due_week, open_week, *histogram = counts[len(by_status):]
+    stats = {
+        "total": total,
+        "by_status": by_status,
+        "overdue": overdue,
+        "due_today": {"total": due_today, "open": open_today},
+        "due_this_week": {"total": due_week, "open": open_week},
+        "progress": [
+            {"min": low, "max": high, "count": count} for (low, high), count in zip(PROGRESS_BUCKETS, histogram)
+        ],
+    }
+    _stats_cache.set(cache_key, stats)
+    return stats
 
 def create_task(db: Session, task: schemas.TaskCreate, user_id: int):
     task_data = task.model_dump()
@@ -54,15 +377,62 @@ def create_task(db: Session, task: schemas.TaskCreate, user_id: int):
     
     db_task = models.Task(**task_data, user_id=user_id, is_active=True)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    db.flush()
 
     if label_names:
-        for label_name in label_names:
-            labelService.add_label_to_task(db, task_id=db_task.id, label_name=label_name, user_id=user_id)
-    
-    db.refresh(db_task)
-    return db_task
+        label_ids = labelService.resolve_label_ids(db, label_names)
+        db.execute(insert(models.task_labels), [
+            {"task_id": db_task.id, "label_id": label_id} for label_id in label_ids.values()
+        ])
+        labelCountService.adjust(db, [user_id], label_ids.values(), 1)
+    changeService.record_tasks(db, [db_task.id], user_id)
+    reminders.stage_tasks(db, [db_task])
+    db.commit()
+    invalidate_task_stats([user_id])
+    return reload_task(db, db_task)
+
+def create_tasks_bulk(db: Session, tasks: List[schemas.TaskCreate], user_id: int):
+    """Insert tasks, any missing labels and their task_labels rows in one transaction.
+
+    Each step is a single batched statement (multi-row INSERT ... RETURNING,
+    set-based label resolution, executemany), so the cost no longer grows with
+    round trips per label.
+    Returns the created tasks in input order.
+    """
+    if not tasks:
+        return []
+    rows = []
+    label_names_per_task = []
+    for task in tasks:
+        task_data = task.model_dump()
+        label_names_per_task.append(list(dict.fromkeys(task_data.pop('labels', None) or [])))
+        rows.append({**task_data, "user_id": user_id, "is_active": True})
+
+    # RETURNING does not promise any row order; sort_by_parameter_order has
+    # SQLAlchemy match each id back to its parameter set.
+    ids = db.scalars(insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True), rows).all()
+
+    all_names = [name for names in label_names_per_task for name in names]
+    if all_names:
+        label_ids = labelService.resolve_label_ids(db, all_names)
+        links = [
+            {"task_id": task_id, "label_id": label_ids[name]}
+            for task_id, names in zip(ids, label_names_per_task)
+            for name in names
+        ]
+        db.execute(insert(models.task_labels), links)
+        labelCountService.apply_deltas(db, Counter((user_id, link["label_id"]) for link in links))
+    changeService.record_tasks(db, ids, user_id)
+    reminders.stage(db, [
+        (task_id, row["due_date"], row.get("status") != models.TaskStatus.DONE)
+        for task_id, row in zip(ids, rows) if row.get("due_date") is not None
+    ])
+    db.commit()
+    invalidate_task_stats([user_id])
+
+    loaded = with_profile(db.query(models.Task).filter(models.Task.id.in_(ids))).all()
+    by_id = {task.id: task for task in loaded}
+    return [by_id[task_id] for task_id in ids]
 
 def update_task(db: Session, task_id: int, task: schemas.TaskUpdate, user_id: int):
     db_task = get_task(db, task_id, user_id)
@@ -93,31 +463,48 @@ def update_task(db: Session, task_id: int, task: schemas.TaskUpdate, user_id: in
 
         for key, value in update_data.items():
             setattr(db_task, key, value)
+        members = labelCountService.task_members(db_task)
+        changeService.record_task(db, db_task)
+        reminders.stage_tasks(db, [db_task])
         db.commit()
-        db.refresh(db_task)
+        invalidate_task_stats(members)
+        db_task = reload_task(db, db_task)
     return db_task
 
 def delete_task(db: Session, task_id: int, user_id: int):
     db_task = get_task(db, task_id, user_id)
     if db_task:
+        members = labelCountService.task_members(db_task)
+        labelCountService.adjust(db, members, [label.id for label in db_task.labels], -1)
+        changeService.record_task(db, db_task, schemas.ChangeOp.DELETE)
+        reminders.stage(db, [(db_task.id, None, False)])
         db.delete(db_task)
         db.commit()
+        invalidate_task_stats(members)
     return db_task
 
 def deactivate_task(db: Session, task_id: int, user_id: int):
     db_task = get_task(db, task_id, user_id)
     if db_task:
         db_task.is_active = False
+        members = labelCountService.task_members(db_task)
+        changeService.record_task(db, db_task, schemas.ChangeOp.DEACTIVATE)
+        reminders.stage_tasks(db, [db_task])
         db.commit()
-        db.refresh(db_task)
+        invalidate_task_stats(members)
+        db_task = reload_task(db, db_task)
     return db_task
 
 def activate_task(db: Session, task_id: int, user_id: int):
     db_task = get_task(db, task_id, user_id)
     if db_task:
         db_task.is_active = True
+        members = labelCountService.task_members(db_task)
+        changeService.record_task(db, db_task)
+        reminders.stage_tasks(db, [db_task])
         db.commit()
-        db.refresh(db_task)
+        invalidate_task_stats(members)
+        db_task = reload_task(db, db_task)
     return db_task
 
 def add_participant_to_task(db: Session, task_id: int, participant_email: str, owner_id: int):
@@ -136,8 +523,12 @@ def add_participant_to_task(db: Session, task_id: int, participant_email: str, o
         return None, "User is already a participant or the owner."
 
     task.participants.append(participant)
+    task.updated_at = models.utcnow()
+    labelCountService.adjust(db, [participant.id], [label.id for label in task.labels], 1)
+    changeService.record_task(db, task)
     db.commit()
-    db.refresh(task)
+    invalidate_task_stats([participant.id])
+    task = reload_task(db, task)
     return task, "Participant added successfully."
 
 def remove_participant_from_task(db: Session, task_id: int, participant_id: int, owner_id: int):
@@ -156,6 +547,11 @@ def remove_participant_from_task(db: Session, task_id: int, participant_id: int,
         return None, "User is not a participant."
 
     task.participants.remove(participant)
+    task.updated_at = models.utcnow()
+    labelCountService.adjust(db, [participant.id], [label.id for label in task.labels], -1)
+    changeService.record_task(db, task)
+    changeService.record_task(db, task, schemas.ChangeOp.DELETE, [participant.id])
     db.commit()
-    db.refresh(task)
+    invalidate_task_stats([participant.id])
+    task = reload_task(db, task)
     return task, "Participant removed successfully."
\ No newline at end of file
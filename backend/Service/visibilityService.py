@@ -0,0 +1,32 @@
+from sqlalchemy import exists, or_, select, union
+
+from backend.Model import models
+
+# A task is visible to a user who owns it or participates in it. Every query
+# that lists or fetches tasks for a user goes through visible_to(); the old
+# OUTER JOIN task_participants + OR form multiplied rows per participant,
+# needed DISTINCT and could not use an index for the OR.
+
+def visible_task_ids(user_id: int):
+    """Ids of the user's owned and shared tasks, each side served by its own index."""
+    owned = select(models.Task.id).where(models.Task.user_id == user_id)
+    shared = select(models.task_participants.c.task_id).where(models.task_participants.c.user_id == user_id)
+    return union(owned, shared)
+
+def visible_to(user_id: int, strategy: str = "union"):
+    """WHERE clause limiting models.Task to rows visible to the user.
+
+    "union" (default) is a semi-join against visible_task_ids(), so tasks are
+    then fetched by primary key. "exists" keeps the owner test on the row and
+    probes task_participants with a correlated EXISTS; Postgres can turn it
+    into a BitmapOr, SQLite cannot, which is why it is not the default.
+    """
+    if strategy == "exists":
+        return or_(
+            models.Task.user_id == user_id,
+            exists().where(
+                models.task_participants.c.task_id == models.Task.id,
+                models.task_participants.c.user_id == user_id,
+            ),
+        )
+    return models.Task.id.in_(visible_task_ids(user_id))
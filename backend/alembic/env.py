@@ -30,6 +30,27 @@ config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Hide objects autogenerate would wrongly diff.
+
+    The full-text search objects (models.TASK_SEARCH_DDL) are created by DDL
+    outside the metadata, so autogenerate would otherwise propose dropping
+    them: the SQLite FTS5 table and its shadow tables, and the Postgres
+    search_vector column and its index. Dialect-only indexes would be
+    proposed on every other dialect.
+    """
+    if type_ == "table" and name.startswith("tasks_fts"):
+        return False
+    if reflected and compare_to is None and name in ("search_vector", "ix_tasks_search_vector"):
+        return False
+    # Indexes made with models.dialect_index exist only on their dialect.
+    dialect = object.info.get("dialect") if type_ == "index" and not reflected else None
+    if dialect is not None and dialect != context.get_context().dialect.name:
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -52,6 +73,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -75,7 +97,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,30 @@
+"""Normalize task created_at precision
+
+Revision ID: 1f6cc8210216
+Revises: 6e04da1a8f33
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6cc8210216'
+down_revision = '6e04da1a8f33'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # SQLite's CURRENT_TIMESTAMP default stored created_at without fractional
+    # seconds, while SQLAlchemy binds datetimes with microseconds. Rewrite old
+    # rows into the bound format so (created_at, id) cursors compare correctly.
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "UPDATE tasks SET created_at = strftime('%Y-%m-%d %H:%M:%f', created_at) || '000' "
+            "WHERE length(created_at) = 19"
+        )
+
+
+def downgrade() -> None:
+    pass
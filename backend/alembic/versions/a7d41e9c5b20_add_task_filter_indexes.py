@@ -0,0 +1,25 @@
+"""Add task filter indexes
+
+Revision ID: a7d41e9c5b20
+Revises: f1c6a2d83e47
+Create Date: 2026-10-18 20:12:05.634981
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d41e9c5b20'
+down_revision = 'f1c6a2d83e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_task_labels_label_id_task_id', 'task_labels', ['label_id', 'task_id'], unique=False)
+    op.create_index('ix_tasks_due_date', 'tasks', ['due_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_due_date', table_name='tasks')
+    op.drop_index('ix_task_labels_label_id_task_id', table_name='task_labels')
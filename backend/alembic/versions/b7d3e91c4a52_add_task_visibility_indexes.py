@@ -0,0 +1,25 @@
+"""Add task visibility indexes
+
+Revision ID: b7d3e91c4a52
+Revises: 1f6cc8210216
+Create Date: 2026-10-18 11:03:27.542310
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e91c4a52'
+down_revision = '1f6cc8210216'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tasks_user_id_is_active_status', 'tasks', ['user_id', 'is_active', 'status'], unique=False)
+    op.create_index('ix_task_participants_user_id_task_id', 'task_participants', ['user_id', 'task_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_task_participants_user_id_task_id', table_name='task_participants')
+    op.drop_index('ix_tasks_user_id_is_active_status', table_name='tasks')
@@ -0,0 +1,41 @@
+"""Add user_label_counts
+
+Revision ID: c41f08d2e6a7
+Revises: b7d3e91c4a52
+Create Date: 2026-10-18 13:20:51.804117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f08d2e6a7'
+down_revision = 'b7d3e91c4a52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_label_counts',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('label_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['label_id'], ['labels.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'label_id')
+    )
+    # Backfill from existing data; same query as labelCountService.actual_counts.
+    op.execute(
+        "INSERT INTO user_label_counts (user_id, label_id, count) "
+        "SELECT members.user_id, task_labels.label_id, count(*) "
+        "FROM task_labels JOIN ("
+        "SELECT id AS task_id, user_id FROM tasks "
+        "UNION SELECT task_id, user_id FROM task_participants"
+        ") AS members ON members.task_id = task_labels.task_id "
+        "GROUP BY members.user_id, task_labels.label_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_label_counts')
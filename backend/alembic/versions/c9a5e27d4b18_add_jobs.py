@@ -0,0 +1,39 @@
+"""Add jobs
+
+Revision ID: c9a5e27d4b18
+Revises: b2e8d4f19c63
+Create Date: 2026-10-18 22:31:09.847215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a5e27d4b18'
+down_revision = 'b2e8d4f19c63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('visible_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('locked_by', sa.String(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_jobs_status_priority_visible_at', 'jobs', ['status', 'priority', 'visible_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_priority_visible_at', table_name='jobs')
+    op.drop_table('jobs')
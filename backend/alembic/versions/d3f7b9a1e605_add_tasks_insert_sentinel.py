@@ -0,0 +1,24 @@
+"""Add tasks insert sentinel
+
+Revision ID: d3f7b9a1e605
+Revises: c9a5e27d4b18
+Create Date: 2026-10-19 10:04:37.512908
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7b9a1e605'
+down_revision = 'c9a5e27d4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('insert_sentinel', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tasks', 'insert_sentinel')
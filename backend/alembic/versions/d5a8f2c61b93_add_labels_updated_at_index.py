@@ -0,0 +1,23 @@
+"""Add labels updated_at index
+
+Revision ID: d5a8f2c61b93
+Revises: c41f08d2e6a7
+Create Date: 2026-10-18 15:21:44.306127
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a8f2c61b93'
+down_revision = 'c41f08d2e6a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_labels_updated_at', 'labels', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_labels_updated_at', table_name='labels')
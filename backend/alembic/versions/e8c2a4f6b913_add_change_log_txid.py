@@ -0,0 +1,29 @@
+"""Add change_log txid
+
+Revision ID: e8c2a4f6b913
+Revises: d3f7b9a1e605
+Create Date: 2026-10-19 11:26:52.190374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c2a4f6b913'
+down_revision = 'd3f7b9a1e605'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('change_log', sa.Column('txid', sa.BigInteger(), nullable=True))
+    # Only Postgres fills txid; on SQLite the feed stays ordered by seq.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index('ix_change_log_user_id_txid_seq', 'change_log', ['user_id', 'txid', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_change_log_user_id_txid_seq', table_name='change_log')
+    op.drop_column('change_log', 'txid')
@@ -0,0 +1,80 @@
+"""Add task search index
+
+Revision ID: f1c6a2d83e47
+Revises: e3b7c90a4f15
+Create Date: 2026-10-18 18:40:27.115820
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a2d83e47'
+down_revision = 'e3b7c90a4f15'
+branch_labels = None
+depends_on = None
+
+TASK_MEMBERS = (
+    "(SELECT 'u' || t.user_id || coalesce(' ' || (SELECT group_concat('u' || p.user_id, ' ') "
+    "FROM task_participants p WHERE p.task_id = t.id), '') FROM tasks t WHERE t.id = {task_id})"
+)
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, members, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description, members) "
+    "VALUES (new.id, new.title, new.description, 'u' || new.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description, user_id ON tasks BEGIN "
+    "UPDATE tasks_fts SET title = new.title, description = new.description, "
+    f"members = {TASK_MEMBERS.format(task_id='new.id')} WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "DELETE FROM tasks_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_participant_insert AFTER INSERT ON task_participants BEGIN "
+    f"UPDATE tasks_fts SET members = {TASK_MEMBERS.format(task_id='new.task_id')} WHERE rowid = new.task_id; END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_participant_delete AFTER DELETE ON task_participants BEGIN "
+    f"UPDATE tasks_fts SET members = {TASK_MEMBERS.format(task_id='old.task_id')} WHERE rowid = old.task_id; END",
+    # Index the rows that already exist.
+    "INSERT INTO tasks_fts(rowid, title, description, members) "
+    "SELECT tasks.id, tasks.title, tasks.description, 'u' || tasks.user_id || coalesce(' ' || shared.members, '') "
+    "FROM tasks LEFT JOIN (SELECT task_id, group_concat('u' || user_id, ' ') AS members "
+    "FROM task_participants GROUP BY task_id) AS shared ON shared.task_id = tasks.id",
+)
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS tasks_fts_participant_delete",
+    "DROP TRIGGER IF EXISTS tasks_fts_participant_insert",
+    "DROP TRIGGER IF EXISTS tasks_fts_delete",
+    "DROP TRIGGER IF EXISTS tasks_fts_update",
+    "DROP TRIGGER IF EXISTS tasks_fts_insert",
+    "DROP TABLE IF EXISTS tasks_fts",
+)
+POSTGRES_UPGRADE = (
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+)
+POSTGRES_DOWNGRADE = (
+    "DROP INDEX IF EXISTS ix_tasks_search_vector",
+    "ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector",
+)
+
+
+def _run(statements) -> None:
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        _run(POSTGRES_UPGRADE)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        _run(POSTGRES_DOWNGRADE)
@@ -0,0 +1,264 @@
+"""Drive the API in-process against a seeded database and report latency budgets.
+
+    python -m backend.benchmarks.api --tasks 10000 --requests 200 --concurrency 8
+    python -m backend.benchmarks.api --write-baseline    # refresh api_baseline.json
+
+Seeds a fresh SQLite file (tuned engine profile) with the requested volumes,
+then sends requests through httpx's ASGI transport, so the full middleware and
+dependency stack runs without a network hop. For each endpoint it reports
+p50/p95/p99 latency, throughput and SQL statements per request.
+
+Results are compared with backend/benchmarks/api_baseline.json (or
+--baseline): the run fails when an endpoint issues more statements per request
+than the baseline (beyond a small margin for auth cache misses), or its p95
+exceeds the baseline by more than --tolerance.
+Latencies are machine dependent; refresh the baseline on the machine that
+enforces it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from backend import database
+from backend.database import Base, build_async_engine, build_engine
+from backend.main import app
+from backend.Model import models
+from backend.Service import authService, hashService, labelCountService
+
+# Auth cache misses make statements/request fractional and vary with request
+# interleaving; an added query per request still trips this margin.
+STATEMENT_SLACK = 0.25
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_baseline.json")
+PASSWORD = "benchmark-password"
+
+
+def seed(engine, args):
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    hashed = hashService.hash_password(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"bench-{i}@example.com", "first_name": "Bench", "last_name": str(i), "hashed_password": hashed}
+            for i in range(1, args.users + 1)
+        ])
+        conn.execute(insert(models.Label), [
+            {"name": f"label-{i}", "color": "#FFFFFF"} for i in range(1, args.labels + 1)
+        ])
+        conn.execute(insert(models.Task), [
+            {
+                "title": f"task {i}",
+                "user_id": rnd.randint(1, args.users),
+                "status": rnd.choice(list(models.TaskStatus)),
+                "is_active": rnd.random() < 0.9,
+            }
+            for i in range(1, args.tasks + 1)
+        ])
+        if args.participants_per_task:
+            conn.execute(insert(models.task_participants), [
+                {"task_id": task_id, "user_id": user_id}
+                for task_id in range(1, args.tasks + 1)
+                for user_id in rnd.sample(range(1, args.users + 1), args.participants_per_task)
+            ])
+        if args.labels_per_task:
+            conn.execute(insert(models.task_labels), [
+                {"task_id": task_id, "label_id": label_id}
+                for task_id in range(1, args.tasks + 1)
+                for label_id in rnd.sample(range(1, args.labels + 1), args.labels_per_task)
+            ])
+    db = sessionmaker(bind=engine)()
+    try:
+        labelCountService.rebuild(db)
+    finally:
+        db.close()
+
+
+def endpoints(args):
+    def bearer(user_id):
+        return {"Authorization": f"Bearer {authService.create_access_token({'sub': f'bench-{user_id}@example.com'})}"}
+
+    tokens = {user_id: bearer(user_id) for user_id in range(1, args.users + 1)}
+
+    def get(path):
+        return lambda rnd: {"method": "GET", "url": path, "headers": tokens[rnd.randint(1, args.users)]}
+
+    def login(rnd):
+        return {
+            "method": "POST",
+            "url": "/users/token",
+            "data": {"username": f"bench-{rnd.randint(1, args.users)}@example.com", "password": PASSWORD},
+        }
+
+    return {
+        "GET /tasks/": (get(f"/tasks/?limit={args.page_size}"), args.requests),
+        "GET /tasks/all": (get("/tasks/all"), args.requests),
+        "GET /labels/with_count": (get("/labels/with_count"), args.requests),
+        "POST /users/token": (login, args.login_requests),
+    }
+
+
+async def run_endpoint(client, build, requests, concurrency, statements):
+    rnd = random.Random(7)
+    pending = [build(rnd) for _ in range(requests)]
+    latencies = []
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while pending:
+            kwargs = pending.pop()
+            start = time.perf_counter()
+            response = await client.request(**kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                failures += 1
+
+    statements.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": requests,
+        "failures": failures,
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "statements_per_request": round(len(statements) / requests, 2),
+    }
+
+
+async def run(args):
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'api-bench.db')}"
+    engine = build_engine(url)
+    async_engine = build_async_engine(database.to_async_url(url))
+    seed(engine, args)
+
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides.update({
+        database.get_db: get_db,
+        database.get_read_db: get_db,
+        database.get_async_db: get_async_db,
+        database.get_async_read_db: get_async_db,
+    })
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for counted in (engine, async_engine.sync_engine):
+        event.listen(counted, "before_cursor_execute", count)
+
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, (build, requests) in endpoints(args).items():
+                if requests <= 0:
+                    continue
+                # One untimed pass warms caches and connection pools.
+                await run_endpoint(client, build, min(requests, args.concurrency), args.concurrency, statements)
+                results[name] = await run_endpoint(client, build, requests, args.concurrency, statements)
+    finally:
+        app.dependency_overrides.clear()
+        hashService.pool.shutdown()
+        await async_engine.dispose()
+        engine.dispose()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        expected = baseline["endpoints"].get(name)
+        if expected is None:
+            continue
+        if current["statements_per_request"] > expected["statements_per_request"] + STATEMENT_SLACK:
+            regressions.append(
+                f"{name}: {current['statements_per_request']} statements/request, baseline {expected['statements_per_request']}"
+            )
+        if current["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms, baseline {expected['p95_ms']}ms (+{tolerance:.0%} allowed)")
+        if current["failures"]:
+            regressions.append(f"{name}: {current['failures']} non-200 responses")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--labels", type=int, default=50)
+    parser.add_argument("--participants-per-task", type=int, default=2)
+    parser.add_argument("--labels-per-task", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--login-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p95 growth over the baseline")
+    parser.add_argument("--write-baseline", action="store_true")
+    args = parser.parse_args()
+
+    config = {
+        key: getattr(args, key)
+        for key in ("users", "tasks", "labels", "participants_per_task", "labels_per_task", "page_size", "concurrency")
+    }
+    results = asyncio.run(run(args))
+
+    print(", ".join(f"{key}={value}" for key, value in config.items()))
+    print(f"{'endpoint':24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'sql/req':>8}")
+    for name, r in results.items():
+        print(f"{name:24} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+              f"{r['throughput_rps']:8.1f} {r['statements_per_request']:8.2f}")
+
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "endpoints": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --write-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["config"] != config:
+        print(f"warning: baseline was recorded with {baseline['config']}")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
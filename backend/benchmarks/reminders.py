@@ -0,0 +1,134 @@
+"""Run the reminder scheduler over many scheduled tasks and report its cost.
+
+    python -m backend.benchmarks.reminders --tasks 1000000 --spread 120
+
+Seeds a SQLite file (tuned engine profile) with --tasks open tasks due a day
+out, evenly over --spread seconds. The scheduler's lead time is then set so
+the first reminder comes due a few seconds after seeding ends, and it runs
+until every reminder is written. Reports:
+
+    seed        insert throughput
+    run         wall time until the last reminder was written, and the
+                reminders written per second
+    queries     count and median/max latency of each scheduler query (window
+                loads, batched reminder writes)
+    memory      largest number of deadlines held in the heap at once, and
+                process RSS growth
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend.database import Base, build_async_engine, build_engine, to_async_url
+from backend.Model import models
+from backend.reminders import ReminderScheduler
+
+CHUNK = 50000
+
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def seed(engine, args, start):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"remind-{i}@example.com", "first_name": "Remind", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, args.users + 1)
+        ])
+    step = args.spread / args.tasks
+    began = time.perf_counter()
+    for offset in range(0, args.tasks, CHUNK):
+        rows = [
+            {
+                "title": f"task {i}",
+                "user_id": i % args.users + 1,
+                "is_active": True,
+                "due_date": start + timedelta(seconds=i * step),
+            }
+            for i in range(offset, min(offset + CHUNK, args.tasks))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(models.Task), rows)
+    return time.perf_counter() - began
+
+
+class TimedScheduler(ReminderScheduler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = defaultdict(list)
+        self.peak = 0
+
+    async def _load(self, now):
+        await super()._load(now)
+        self.peak = max(self.peak, len(self._heap))
+
+    async def _session_call(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return await super()._session_call(fn, *args)
+        finally:
+            self.timings[fn.__name__].append((time.perf_counter() - start) * 1000)
+
+
+async def run(url, args):
+    engine = build_async_engine(to_async_url(url))
+    scheduler = TimedScheduler(
+        async_sessionmaker(engine, autoflush=False, expire_on_commit=False),
+        lead=args.lead, horizon=args.horizon, batch_size=args.batch_size, flush_interval=args.flush,
+    )
+    rss_before = rss_kb()
+    start = time.perf_counter()
+    await scheduler.start()
+    while scheduler.recorded < args.tasks:
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+    await engine.dispose()
+    return scheduler, elapsed, rss_kb() - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--spread", type=float, default=120, help="seconds over which the reminders come due")
+    parser.add_argument("--horizon", type=float, default=60)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--flush", type=float, default=1)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'reminders.db')}"
+    engine = build_engine(url)
+    first_due = models.utcnow() + timedelta(days=1)
+    seconds = seed(engine, args, first_due)
+    print(f"seed      {args.tasks} tasks in {seconds:.1f} s ({args.tasks / seconds:,.0f} rows/s)")
+    args.lead = (first_due - models.utcnow()).total_seconds() - 5
+
+    scheduler, elapsed, rss_growth = asyncio.run(run(url, args))
+    with engine.connect() as conn:
+        written = conn.scalar(select(func.count()).select_from(models.reminders))
+    print(f"run       {written} reminders in {elapsed:.1f} s ({written / elapsed:,.0f}/s, {args.spread:g} s spread)")
+    print(f"queries   {'call':<10} {'count':>6} {'median ms':>10} {'max ms':>8}")
+    for name, samples in sorted(scheduler.timings.items()):
+        print(f"          {name:<10} {len(samples):6d} {statistics.median(samples):10.1f} {max(samples):8.1f}")
+    print(f"memory    peak heap {scheduler.peak} deadlines, RSS +{rss_growth / 1024:.1f} MiB")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Compare full-text task search with the LIKE scan it replaces, at scale.
+
+    python -m backend.benchmarks.search --tasks 1000000
+
+Seeds a SQLite file (tuned engine profile) with generated titles and
+descriptions drawn from a Zipf-like vocabulary, so some words are in most
+tasks and others in a handful. Reports:
+
+    seed        insert throughput with the FTS triggers maintaining the index
+    reindex     searchService.reindex() (FTS5 'rebuild') over every row
+    size        database size, and the share taken by the FTS index
+    queries     median latency of searchService.search_tasks() and of the
+                equivalent LIKE '%word%' query, for a rare, a mid-frequency
+                and a common word, as seen by a typical user and by one who
+                owns a tenth of all tasks
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import func, insert, or_, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, build_engine
+from backend.Model import models
+from backend.Service import searchService
+from backend.Service.visibilityService import visible_to
+
+VOCABULARY = 20000
+CHUNK = 50000
+
+
+def word(rank):
+    return f"w{rank}"
+
+
+def seed(engine, args):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(7)
+    # Zipf-like: word k is drawn with probability ~ 1/k.
+    weights = [1 / k for k in range(1, VOCABULARY + 1)]
+    population = list(range(1, VOCABULARY + 1))
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"search-{i}@example.com", "first_name": "Search", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, args.users + 1)
+        ])
+    start = time.perf_counter()
+    for offset in range(0, args.tasks, CHUNK):
+        count = min(CHUNK, args.tasks - offset)
+        words = rnd.choices(population, weights, k=count * 20)
+        rows = []
+        for i in range(count):
+            chunk = words[i * 20:(i + 1) * 20]
+            rows.append({
+                "title": " ".join(map(word, chunk[:4])),
+                "description": " ".join(map(word, chunk[4:])),
+                # User 1 owns a tenth of everything; the rest is spread evenly.
+                "user_id": 1 if rnd.random() < 0.1 else rnd.randint(2, args.users),
+                "is_active": True,
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(models.Task), rows)
+    return time.perf_counter() - start
+
+
+def like_search(db, user_id, term, limit=20):
+    pattern = f"%{term}%"
+    return (
+        db.query(models.Task)
+        .filter(or_(models.Task.title.like(pattern), models.Task.description.like(pattern)),
+                visible_to(user_id), models.Task.is_active.is_(True))
+        .order_by(models.Task.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "search.db")
+    engine = build_engine(f"sqlite:///{path}")
+    seconds = seed(engine, args)
+    print(f"seed      {args.tasks} tasks in {seconds:.1f} s ({args.tasks / seconds:,.0f} rows/s, triggers on)")
+
+    db = sessionmaker(bind=engine)()
+    start = time.perf_counter()
+    searchService.reindex(db)
+    print(f"reindex   {time.perf_counter() - start:.1f} s")
+
+    db.execute(text("VACUUM"))
+    total = os.path.getsize(path)
+    fts = db.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name LIKE 'tasks_fts%'")).scalar() or 0
+    print(f"size      {total / 2**20:.0f} MiB, FTS index {fts / 2**20:.0f} MiB ({fts / total:.0%})")
+
+    print(f"queries   median ms over {args.repeat} runs")
+    print(f"{'user':>6} {'visible':>8} {'word':>8} {'matches':>9} {'fts':>8} {'like':>9}")
+    for user_id in (2, 1):
+        visible = db.scalar(func.count().select().where(visible_to(user_id)).select_from(models.Task))
+        for rank in (5000, 200, 3):
+            term = word(rank)
+            matches = db.execute(text("SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH :q"), {"q": f'"{term}"'}).scalar()
+            fts_ms = timed(lambda: searchService.search_tasks(db, user_id, term), args.repeat)
+            # LIKE '%w3%' also hits w30, w300...; it is the scan being replaced, not an equal query.
+            like_ms = timed(lambda: like_search(db, user_id, term), max(1, args.repeat // 5))
+            print(f"{user_id:6d} {visible:8d} {term:>8} {matches:9d} {fts_ms:8.1f} {like_ms:9.1f}")
+
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time response serialization of nested tasks, separately from the queries.
+
+    python -m backend.benchmarks.serialization --tasks 1000 10000
+
+Loads the tasks with the "full" profile from an in-memory SQLite database,
+then times each stage on the loaded ORM objects: validating them into
+schemas.Task (what FastAPI does with the endpoint's return value) and the
+candidate ways of turning the validated models into JSON bytes:
+
+    dump_json          pydantic-core straight to bytes (FastAPI's default path)
+    json.dumps         dump_python(mode="json") + stdlib json (JSONResponse)
+    orjson             dump_python() + orjson.dumps (ORJSONResponse), if installed
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import schemas
+from backend.database import Base
+from backend.Model import models
+from backend.Service import taskService
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def seed(engine, tasks, users=20, labels=30):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"bench-{i}@example.com", "first_name": "Bench", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(models.Label), [{"name": f"label-{i}", "color": "#FFFFFF"} for i in range(1, labels + 1)])
+        # User 1 owns everything, so one get_all_user_tasks call loads every task.
+        conn.execute(insert(models.Task), [
+            {"title": f"task {i}", "description": "benchmark", "user_id": 1, "is_active": True}
+            for i in range(1, tasks + 1)
+        ])
+        conn.execute(insert(models.task_participants), [
+            {"task_id": task_id, "user_id": user_id}
+            for task_id in range(1, tasks + 1)
+            for user_id in rnd.sample(range(2, users + 1), 2)
+        ])
+        conn.execute(insert(models.task_labels), [
+            {"task_id": task_id, "label_id": label_id}
+            for task_id in range(1, tasks + 1)
+            for label_id in rnd.sample(range(1, labels + 1), 3)
+        ])
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    adapter = schemas.TaskListAdapter
+    print(f"median ms over {args.repeat} runs; 2 participants and 3 labels per task")
+    print(f"{'tasks':>6} {'validate':>10} {'dump_json':>10} {'json.dumps':>11} {'orjson':>8}")
+    for count in args.tasks:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        seed(engine, count)
+        db = sessionmaker(bind=engine)()
+        tasks = taskService.get_all_user_tasks(db, 1)
+        assert len(tasks) == count
+
+        validate = timed(lambda: adapter.validate_python(tasks), args.repeat)
+        validated = adapter.validate_python(tasks)
+        dump_json = timed(lambda: adapter.dump_json(validated), args.repeat)
+        stdlib = timed(lambda: json.dumps(adapter.dump_python(validated, mode="json")).encode(), args.repeat)
+        fast = timed(lambda: orjson.dumps(adapter.dump_python(validated)), args.repeat) if orjson else float("nan")
+        print(f"{count:6d} {validate:10.1f} {dump_json:10.1f} {stdlib:11.1f} {fast:8.1f}")
+
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
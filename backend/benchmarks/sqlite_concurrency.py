@@ -0,0 +1,132 @@
+"""Measure read/write throughput on a file-backed SQLite database per engine profile.
+
+    python -m backend.benchmarks.sqlite_concurrency --readers 8 --writers 4 --seconds 10
+
+Each profile gets a fresh database in a temporary directory. Reader threads
+page through a user's tasks with taskService.get_tasks; writer threads update
+and create tasks. Operations that fail with "database is locked" are counted
+as errors rather than retried.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend import schemas
+from backend.database import Base, build_engine
+from backend.Model import models
+from backend.Service import taskService
+
+PROFILES = ("default", "tuned")
+
+
+def seed(engine, users, tasks):
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"bench-{i}@example.com", "first_name": "Bench", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(models.Task), [
+            {"title": f"task {i}", "user_id": rnd.randint(1, users), "is_active": True}
+            for i in range(1, tasks + 1)
+        ])
+        conn.execute(insert(models.task_participants), [
+            {"task_id": task_id, "user_id": user_id}
+            for task_id in range(1, tasks + 1)
+            for user_id in rnd.sample(range(1, users + 1), 2)
+        ])
+
+
+def read_op(db, rnd, users):
+    taskService.get_tasks(db, rnd.randint(1, users), limit=50)
+
+
+def write_op(db, rnd, users):
+    user_id = rnd.randint(1, users)
+    if rnd.random() < 0.5:
+        task = db.query(models.Task).filter(models.Task.user_id == user_id).first()
+        if task is not None:
+            status = rnd.choice(list(models.TaskStatus))
+            taskService.update_task(db, task.id, schemas.TaskUpdate(status=status), user_id)
+            return
+    taskService.create_task(db, schemas.TaskCreate(title="bench write", labels=[]), user_id)
+
+
+def worker(Session, op, users, deadline, seed_value, results):
+    rnd = random.Random(seed_value)
+    ops = errors = 0
+    latencies = []
+    while time.monotonic() < deadline:
+        db = Session()
+        start = time.perf_counter()
+        try:
+            op(db, rnd, users)
+            ops += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+        except OperationalError:
+            errors += 1
+            db.rollback()
+        finally:
+            db.close()
+    results.append((ops, errors, latencies))
+
+
+def run_profile(profile, args):
+    directory = tempfile.mkdtemp()
+    engine = build_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile=profile)
+    seed(engine, args.users, args.tasks)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    reads, writes = [], []
+    deadline = time.monotonic() + args.seconds
+    threads = [
+        threading.Thread(target=worker, args=(Session, read_op, args.users, deadline, i, reads))
+        for i in range(args.readers)
+    ] + [
+        threading.Thread(target=worker, args=(Session, write_op, args.users, deadline, 1000 + i, writes))
+        for i in range(args.writers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return summarize(reads, args.seconds), summarize(writes, args.seconds)
+
+
+def summarize(results, seconds):
+    ops = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+    return ops / seconds, errors, statistics.median(latencies) if latencies else 0.0, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profile", choices=PROFILES, action="append")
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile, {args.tasks} tasks")
+    print(f"{'profile':10} {'kind':6} {'ops/s':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for profile in args.profile or PROFILES:
+        for kind, (rate, errors, p50, p95) in zip(("read", "write"), run_profile(profile, args)):
+            print(f"{profile:10} {kind:6} {rate:9.1f} {errors:7d} {p50:8.2f} {p95:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
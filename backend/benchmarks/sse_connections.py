@@ -0,0 +1,174 @@
+"""Hold many idle /tasks/stream connections on one worker and time the fan-out.
+
+    python -m backend.benchmarks.sse_connections --connections 5000
+
+Starts one uvicorn worker on a fresh SQLite file, opens --connections event
+streams spread over --users users, then reports:
+
+    connect      time to open every stream, and p50/p99 per connection
+    memory       worker RSS before and after, and the cost per open stream
+    fan-out      time until every stream of one user has a task update, and
+                 until every stream has a label change (a global event)
+
+The soft open-files limit is raised to the hard limit for this process and
+the worker; each stream costs one descriptor on either side.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import insert
+
+from backend.database import Base, build_engine
+from backend.Model import models
+from backend.Service import authService
+
+
+def seed(url, users):
+    engine = build_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"stream-{i}@example.com", "first_name": "Stream", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(models.Task), [{"title": f"task {i}", "user_id": i} for i in range(1, users + 1)])
+    engine.dispose()
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class Stream:
+    def __init__(self, user):
+        self.user = user
+        self.seen = {}
+        self.reader = self.writer = None
+
+    async def open(self, port, token):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+        self.writer.write(
+            f"GET /tasks/stream HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n"
+            f"Accept: text/event-stream\r\n\r\n".encode()
+        )
+        buffered = b""
+        while b"retry:" not in buffered:
+            chunk = await self.reader.read(4096)
+            if not chunk:
+                raise ConnectionError(buffered.decode(errors="replace")[:200])
+            buffered += chunk
+
+    async def listen(self, markers):
+        while True:
+            chunk = await self.reader.read(4096)
+            if not chunk:
+                return
+            now = time.perf_counter()
+            for marker in markers:
+                if marker in chunk and marker not in self.seen:
+                    self.seen[marker] = now
+
+
+async def run(args, port, pid):
+    tokens = {user: authService.create_access_token({"sub": f"stream-{user}@example.com"}) for user in range(1, args.users + 1)}
+    streams = [Stream(i % args.users + 1) for i in range(args.connections)]
+    rss_before = rss_kb(pid)
+
+    connect_times = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def open_stream(stream):
+        async with semaphore:
+            start = time.perf_counter()
+            await stream.open(port, tokens[stream.user])
+            connect_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(open_stream(stream) for stream in streams))
+    connect_total = time.perf_counter() - start
+    await asyncio.sleep(1)
+    rss_after = rss_kb(pid)
+
+    task_marker, label_marker = b'"entity": "task"', b'"entity": "label"'
+    listeners = [asyncio.create_task(stream.listen((task_marker, label_marker))) for stream in streams]
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        gauge = next(line for line in (await client.get("/metrics")).text.splitlines() if line.startswith("sse_connections "))
+        headers = {"Authorization": f"Bearer {tokens[1]}"}
+        start = time.perf_counter()
+        await client.put("/tasks/1", json={"title": "updated"}, headers=headers)
+        user_streams = [stream for stream in streams if stream.user == 1]
+        while not all(task_marker in stream.seen for stream in user_streams):
+            await asyncio.sleep(0.005)
+        task_fanout = max(stream.seen[task_marker] for stream in user_streams) - start
+
+        start = time.perf_counter()
+        await client.post("/tasks/1/add_label", json={"label_name": "broadcast"}, headers=headers)
+        while not all(label_marker in stream.seen for stream in streams):
+            await asyncio.sleep(0.005)
+        label_fanout = max(stream.seen[label_marker] for stream in streams) - start
+
+    for listener in listeners:
+        listener.cancel()
+    for stream in streams:
+        stream.writer.close()
+
+    connect_times.sort()
+    print(f"{args.connections} streams over {args.users} users, one worker ({gauge})")
+    print(f"connect   {connect_total:.2f} s total, p50 {statistics.median(connect_times) * 1000:.1f} ms, "
+          f"p99 {connect_times[int(len(connect_times) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"memory    {rss_before / 1024:.1f} -> {rss_after / 1024:.1f} MiB, "
+          f"{(rss_after - rss_before) / args.connections:.1f} KiB per stream")
+    print(f"fan-out   task update to {len(user_streams)} streams in {task_fanout * 1000:.1f} ms, "
+          f"label change to {len(streams)} streams in {label_fanout * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=200, help="streams being opened at once")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'sse.db')}"
+    seed(url, args.users)
+    env = {**os.environ, "DATABASE_URL": url, "SSE_MAX_CONNECTIONS": str(args.connections + 100)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(args.port), "--log-level", "warning",
+         "--backlog", str(args.concurrency * 4)],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{args.port}/metrics")
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise SystemExit("server did not start")
+                time.sleep(0.2)
+        asyncio.run(run(args, args.port, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compare the task visibility predicates on a dataset with many participants per task.
+
+    python -m backend.benchmarks.visibility --tasks 20000 --participants-per-task 8
+
+Times a get_tasks-style page (count + first page) and a get_all_user_tasks-style
+full read for the legacy OUTER JOIN + DISTINCT form and for each strategy of
+visibilityService.visible_to. Uses an in-memory SQLite database unless
+--database-url points elsewhere (its tables are dropped and recreated).
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine, func, insert, or_, select
+from sqlalchemy.pool import StaticPool
+
+from backend.database import Base
+from backend.Model import models
+from backend.Service.visibilityService import visible_to
+
+
+def legacy_query(user_id):
+    return select(models.Task).outerjoin(models.task_participants).where(
+        or_(
+            models.Task.user_id == user_id,
+            models.task_participants.c.user_id == user_id
+        )
+    ).distinct()
+
+
+def predicate_query(strategy):
+    return lambda user_id: select(models.Task).where(visible_to(user_id, strategy=strategy))
+
+
+FORMS = {
+    "legacy outer join + distinct": legacy_query,
+    "exists": predicate_query("exists"),
+    "union (default)": predicate_query("union"),
+}
+
+
+def seed(engine, users, tasks, participants_per_task):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"bench-{i}@example.com", "first_name": "Bench", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(models.Task), [
+            {"title": f"task {i}", "user_id": rnd.randint(1, users), "is_active": True}
+            for i in range(1, tasks + 1)
+        ])
+        links = [
+            {"task_id": task_id, "user_id": user_id}
+            for task_id in range(1, tasks + 1)
+            for user_id in rnd.sample(range(1, users + 1), participants_per_task)
+        ]
+        conn.execute(insert(models.task_participants), links)
+
+
+def timed(conn, stmt, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(stmt).all()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--participants-per-task", type=int, default=8)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    seed(engine, args.users, args.tasks, args.participants_per_task)
+    user_ids = random.Random(7).sample(range(1, args.users + 1), 5)
+
+    print(f"{args.tasks} tasks, {args.users} users, {args.participants_per_task} participants/task, "
+          f"median ms over {args.repeat} runs x {len(user_ids)} users")
+    print(f"{'form':32} {'count+page':>12} {'full read':>12}")
+    with engine.connect() as conn:
+        for name, build in FORMS.items():
+            page, full = [], []
+            for user_id in user_ids:
+                query = build(user_id)
+                count = select(func.count()).select_from(query.subquery())
+                first_page = query.order_by(models.Task.created_at, models.Task.id).limit(args.page_size)
+                page.append(timed(conn, count, args.repeat) + timed(conn, first_page, args.repeat))
+                full.append(timed(conn, query, args.repeat))
+            print(f"{name:32} {statistics.mean(page):12.2f} {statistics.mean(full):12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Weak ETags for per-user reads. Endpoints hash a cheap version query (see
+# taskService.get_tasks_version) instead of the payload, so a matching
+# If-None-Match is answered before the rows are fetched or serialized.
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+
+def _if_none_match(request: Request):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return set()
+    # Weak comparison: W/"x" and "x" name the same representation.
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def evaluate(request: Request, response: Response, *parts) -> Optional[Response]:
+    """Return a 304 when If-None-Match matches, else set the ETag on `response`.
+
+    `parts` must identify everything the body depends on: the resource, the
+    caller, the query string and the version.
+    """
+    etag = make_etag(*parts)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    candidates = _if_none_match(request)
+    if "*" in candidates or etag.removeprefix("W/") in candidates:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+import math
 import os
+import time
 from dotenv import load_dotenv
 
+
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,15 +18,144 @@ DB_PATH = os.path.join(BASE_DIR, "sql_app.db")
 # local development when no online database url is provided
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
 
-connect_args = {}
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
-    connect_args = {"check_same_thread": False}
+# "tuned" applies the SQLite pragmas and pool settings below; "default" keeps
+# the driver defaults.
+DB_ENGINE_PROFILE = os.getenv("DB_ENGINE_PROFILE", "tuned")
+
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Negative values are KiB; the page cache is per connection, so this is
+# multiplied by the number of pooled connections.
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -20000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "mmap_size": SQLITE_MMAP_SIZE,
+}
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_memory_sqlite(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in url
+
+def engine_options(url: str, profile: str = DB_ENGINE_PROFILE) -> dict:
+    options = {}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+    if profile != "tuned":
+        return options
+    if is_sqlite(url):
+        options["connect_args"]["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        if _is_memory_sqlite(url):
+            # In-memory databases use a singleton pool with no sizing knobs.
+            return options
+    else:
+        # Server connections can be dropped underneath an idle pool.
+        options.update(pool_pre_ping=True, pool_recycle=DB_POOL_RECYCLE)
+    options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def apply_sqlite_pragmas(engine, pragmas: dict = None):
+    # For async engines pass engine.sync_engine; the adapted aiosqlite
+    # connection accepts the same cursor calls.
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args=connect_args
-)
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def build_engine(url: str, profile: str = DB_ENGINE_PROFILE):
+    built = create_engine(url, **engine_options(url, profile))
+    if profile == "tuned" and is_sqlite(url):
+        apply_sqlite_pragmas(built)
+    return built
+
+def build_async_engine(url: str, profile: str = DB_ENGINE_PROFILE):
+    built = create_async_engine(url, **engine_options(url, profile))
+    if profile == "tuned" and is_sqlite(url):
+        apply_sqlite_pragmas(built.sync_engine)
+    return built
+
+engine = build_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    # Same database, async driver: aiosqlite locally, asyncpg for Postgres.
+    for prefix, async_prefix in (
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("sqlite+pysqlite://", "sqlite+aiosqlite://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+
+async_engine = build_async_engine(ASYNC_DATABASE_URL)
+# expire_on_commit=False: attributes must stay readable after commit, since an
+# expired attribute cannot lazy-load outside the session's greenlet.
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Reads can go to a replica. Unset, they share the primary engines and pools.
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", SQLALCHEMY_DATABASE_URL)
+ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_DATABASE_URL", to_async_url(READ_DATABASE_URL))
+# After a write, the same client reads from the primary for this many seconds
+# so replication lag cannot hide the caller's own changes.
+READ_AFTER_WRITE_WINDOW = float(os.getenv("READ_AFTER_WRITE_WINDOW", 5))
+
+if READ_DATABASE_URL == SQLALCHEMY_DATABASE_URL:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+else:
+    read_engine = build_engine(READ_DATABASE_URL)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+if ASYNC_READ_DATABASE_URL == ASYNC_DATABASE_URL:
+    async_read_engine = async_engine
+    AsyncReadSessionLocal = AsyncSessionLocal
+else:
+    async_read_engine = build_async_engine(ASYNC_READ_DATABASE_URL)
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+# Responses to writes set this cookie to the end of the window (a Unix time).
+# The client carries it, so any worker or app replica that serves its next
+# read honours it.
+READ_PRIMARY_COOKIE = "read_primary_until"
+
+def read_primary_cookie() -> str:
+    """Set-Cookie value pinning the client's reads to the primary for READ_AFTER_WRITE_WINDOW."""
+    until = time.time() + READ_AFTER_WRITE_WINDOW
+    max_age = math.ceil(READ_AFTER_WRITE_WINDOW)
+    return f"{READ_PRIMARY_COOKIE}={until:.3f}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+
+def reads_from_primary(request: Request) -> bool:
+    try:
+        until = float(request.cookies.get(READ_PRIMARY_COOKIE, 0))
+    except ValueError:
+        return False
+    now = time.time()
+    # Clients that ignore Max-Age still lose the pin when the window ends, and
+    # a forged far-future value cannot pin reads for longer than one window.
+    return now < until <= now + READ_AFTER_WRITE_WINDOW
+
 Base = declarative_base()
 
 def get_db():
@@ -29,3 +164,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_read_db(request: Request):
+    db = (SessionLocal if reads_from_primary(request) else ReadSessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    async with (AsyncSessionLocal if reads_from_primary(request) else AsyncReadSessionLocal)() as db:
+        yield db
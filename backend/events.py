@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per connection; a subscriber that falls this far behind is dropped.
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))
+# Open streams allowed per worker; further connects get a 503.
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", 10000))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+
+# Queued in place of further events once a subscriber overflows.
+OVERFLOW = object()
+
+
+class Subscription:
+    __slots__ = ("hub", "user_id", "queue", "loop", "dropped")
+
+    def __init__(self, hub: "Hub", user_id: int):
+        self.hub = hub
+        self.user_id = user_id
+        self.queue = asyncio.Queue(hub.queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = False
+
+    def offer(self, message: bytes):
+        # Runs on the subscriber's loop. Publishers never wait: a full queue
+        # means the client is not reading, so it gets an overflow marker and
+        # has to catch up through /tasks/changes instead.
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped = True
+            self.hub.dropped += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+
+class Hub:
+    """In-process fan-out of change events to the streams open on this worker."""
+
+    def __init__(self, queue_size: int = SSE_QUEUE_SIZE, max_connections: int = SSE_MAX_CONNECTIONS):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.published = 0
+        self.dropped = 0
+        self._subscribers = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def subscribe(self, user_id: int) -> Optional[Subscription]:
+        """Register a stream on the running loop; None when the worker is full."""
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            if self._count >= self.max_connections:
+                return None
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers and subscription in subscribers:
+                subscribers.remove(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, changes):
+        """Deliver (user_id, entity, entity_id, op) tuples; user_id None goes to everyone.
+
+        Safe to call from any thread. Each message is encoded once, however
+        many streams receive it.
+        """
+        with self._lock:
+            if not self._count:
+                return
+            targets = []
+            for user_id, entity, entity_id, op in changes:
+                if user_id is None:
+                    subscribers = [s for group in self._subscribers.values() for s in group]
+                else:
+                    subscribers = list(self._subscribers.get(user_id, ()))
+                if subscribers:
+                    data = json.dumps({"entity": entity, "entity_id": entity_id, "op": op})
+                    targets.append((f"event: {op}\ndata: {data}\n\n".encode(), subscribers))
+        for message, subscribers in targets:
+            self.published += 1
+            for subscription in subscribers:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, message)
+                except RuntimeError:
+                    # The stream's loop is gone; its generator never cleaned up.
+                    self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+
+def stage(db: Session, rows):
+    """Queue change rows to publish once `db` commits; a rollback discards them."""
+    db.info.setdefault("pending_events", []).extend(rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    rows = session.info.pop("pending_events", None)
+    if rows:
+        try:
+            hub.publish([(r["user_id"], r["entity"], r["entity_id"], r["op"]) for r in rows])
+        except Exception:
+            # The write is committed; a lost notification must not fail it.
+            logger.exception("failed to publish change events")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("pending_events", None)
+
+
+async def stream(subscription: Subscription, heartbeat: float = SSE_HEARTBEAT_SECONDS):
+    """Server-sent events for one subscription; unsubscribes when the client goes away."""
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from timing out an idle stream.
+                yield b": keepalive\n\n"
+                continue
+            if message is OVERFLOW:
+                yield b"event: resync\ndata: {}\n\n"
+                return
+            yield message
+    finally:
+        subscription.hub.unsubscribe(subscription)
@@ -0,0 +1,315 @@
+import importlib
+import logging
+import os
+import socket
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from backend import database
+from backend.Model import models
+
+logger = logging.getLogger(__name__)
+
+# "database" keeps the queue in the app database (models.jobs); "module:Class"
+# loads another JobBackend, e.g. one that talks to a broker.
+JOB_BACKEND = os.getenv("JOB_BACKEND", "database")
+# "thread" or "process": where a worker runs its jobs.
+JOB_POOL = os.getenv("JOB_POOL", "thread")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", 4))
+# How long an idle worker waits before looking for new jobs again.
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1))
+# A claimed job is hidden from other workers this long, then claimable again;
+# keep it above the slowest job.
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+# Retry n of a failed job waits JOB_RETRY_BACKOFF_SECONDS * 2**(n-1).
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", 10))
+
+QUEUED, DEAD = "queued", "dead"
+
+handlers: Dict[str, Callable] = {}
+
+
+def handler(name: str):
+    """Register fn(db, **payload) as the handler for jobs called `name`.
+
+    Handlers must be module-level functions so the process pool can import
+    them, and should be safe to run twice: a job whose worker dies or
+    overruns the visibility timeout is run again.
+    """
+    def register(fn):
+        handlers[name] = fn
+        return fn
+    return register
+
+
+class Job(NamedTuple):
+    id: Any
+    name: str
+    payload: dict
+    attempts: int
+    max_attempts: int
+
+
+class JobBackend(ABC):
+    """Where queued jobs live. Subclass it to move the queue to a broker.
+
+    A transactional backend writes jobs in the enqueuing session's own
+    transaction, so a job exists exactly when the write that queued it
+    committed. Any other backend is handed the jobs right after the commit.
+    """
+
+    transactional = False
+
+    @abstractmethod
+    def enqueue(self, rows: List[dict], db: Optional[Session] = None):
+        """Store new jobs; `db` is the enqueuing session for transactional backends."""
+
+    @abstractmethod
+    def claim(self, worker_id: str, limit: int, visibility_timeout: float) -> List[Job]:
+        """Up to `limit` ready jobs, hidden from other workers for visibility_timeout seconds."""
+
+    @abstractmethod
+    def complete(self, job: Job):
+        """Remove a job that ran successfully."""
+
+    @abstractmethod
+    def fail(self, job: Job, error: str, retry: bool = True):
+        """Record a failed attempt; retry it later, or give up when retry is False or attempts ran out."""
+
+
+class DatabaseBackend(JobBackend):
+    """The jobs table in the app database; on SQLite, one file needs no broker.
+
+    Claims are one UPDATE ... RETURNING over the best ready rows, which
+    SQLite serializes and Postgres keeps apart with SKIP LOCKED, so two
+    workers never claim the same job. complete() and fail() only touch the
+    job if it has not been claimed again since (the attempt count matches).
+    """
+
+    transactional = True
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory
+
+    def _session(self) -> Session:
+        return (self.session_factory or database.SessionLocal)()
+
+    def enqueue(self, rows: List[dict], db: Optional[Session] = None):
+        if db is not None:
+            db.execute(insert(models.jobs), rows)
+            return
+        with self._session() as db:
+            db.execute(insert(models.jobs), rows)
+            db.commit()
+
+    def claim(self, worker_id: str, limit: int, visibility_timeout: float) -> List[Job]:
+        table = models.jobs
+        now = models.utcnow()
+        ready = (
+            select(table.c.id)
+            .where(table.c.status == QUEUED, table.c.visible_at <= now)
+            .order_by(table.c.priority, table.c.visible_at, table.c.id)
+            .limit(limit)
+        )
+        with self._session() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                ready = ready.with_for_update(skip_locked=True)
+            rows = db.execute(
+                update(table)
+                .where(table.c.id.in_(ready.scalar_subquery()))
+                .values(
+                    visible_at=now + timedelta(seconds=visibility_timeout),
+                    attempts=table.c.attempts + 1,
+                    locked_by=worker_id,
+                )
+                .returning(table.c.id, table.c.name, table.c.payload, table.c.attempts, table.c.max_attempts)
+            ).all()
+            db.commit()
+        return [Job(*row) for row in rows]
+
+    def _settle(self, job: Job, stmt):
+        table = models.jobs
+        with self._session() as db:
+            db.execute(stmt.where(table.c.id == job.id, table.c.attempts == job.attempts))
+            db.commit()
+
+    def complete(self, job: Job):
+        self._settle(job, delete(models.jobs))
+
+    def fail(self, job: Job, error: str, retry: bool = True):
+        if retry and job.attempts < job.max_attempts:
+            delay = JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            values = {"visible_at": models.utcnow() + timedelta(seconds=delay)}
+        else:
+            values = {"status": DEAD}
+        self._settle(job, update(models.jobs).values(locked_by=None, last_error=error, **values))
+
+
+def load_backend(spec: str) -> JobBackend:
+    if spec == "database":
+        return DatabaseBackend()
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+backend = load_backend(JOB_BACKEND)
+
+
+def _row(name: str, payload: Optional[dict], priority: int, delay: float, max_attempts: Optional[int]) -> dict:
+    return {
+        "name": name,
+        "payload": payload or {},
+        "priority": priority,
+        "max_attempts": max_attempts or JOB_MAX_ATTEMPTS,
+        "visible_at": models.utcnow() + timedelta(seconds=delay),
+    }
+
+
+def enqueue(name: str, payload: Optional[dict] = None, *, priority: int = 0, delay: float = 0, max_attempts: int = None):
+    """Queue a job right away, outside any transaction."""
+    backend.enqueue([_row(name, payload, priority, delay, max_attempts)])
+
+
+def enqueue_after_commit(
+    db: Session, name: str, payload: Optional[dict] = None, *, priority: int = 0, delay: float = 0, max_attempts: int = None
+):
+    """Queue a job for when `db` commits; a rollback drops it.
+
+    For side effects of a write that need not finish inside the request.
+    The payload must be JSON; pass ids rather than ORM objects.
+    """
+    db.info.setdefault("pending_jobs", []).append(_row(name, payload, priority, delay, max_attempts))
+
+
+@event.listens_for(Session, "before_commit")
+def _enqueue_in_transaction(session):
+    if backend.transactional:
+        rows = session.info.pop("pending_jobs", None)
+        if rows:
+            backend.enqueue(rows, session)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_after_commit(session):
+    rows = session.info.pop("pending_jobs", None)
+    if rows:
+        try:
+            backend.enqueue(rows)
+        except Exception:
+            # The write is committed; a lost job must not fail it.
+            logger.exception("failed to enqueue %d jobs", len(rows))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("pending_jobs", None)
+
+
+def _execute(fn, payload: dict, session_factory=None):
+    db = (session_factory or database.SessionLocal)()
+    try:
+        return fn(db, **payload)
+    finally:
+        db.close()
+
+
+def _init_process():
+    # Pooled connections inherited through fork belong to the parent.
+    database.engine.dispose(close=False)
+
+
+class Worker:
+    """Claims jobs from the backend and runs them on a thread or process pool."""
+
+    def __init__(
+        self,
+        job_backend: Optional[JobBackend] = None,
+        concurrency: int = JOB_CONCURRENCY,
+        pool: str = JOB_POOL,
+        poll_interval: float = JOB_POLL_SECONDS,
+        visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+        session_factory=None,
+    ):
+        if pool not in ("thread", "process"):
+            raise ValueError(f"Unknown job pool: {pool}")
+        self.backend = job_backend or backend
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        # Thread pools only; worker processes use their own database.SessionLocal.
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.completed = 0
+        self.failed = 0
+
+    def _executor(self):
+        if self.pool == "process":
+            return ProcessPoolExecutor(self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix="job")
+
+    def _submit(self, executor, inflight, job: Job):
+        fn = handlers.get(job.name)
+        if fn is None:
+            self._fail(job, f"No handler for job {job.name!r}", retry=False)
+        elif job.attempts > job.max_attempts:
+            # Claimed again after its last attempt overran the visibility timeout.
+            self._fail(job, f"Gave up after {job.max_attempts} attempts", retry=False)
+        else:
+            factory = (self.session_factory,) if self.pool == "thread" else ()
+            inflight[executor.submit(_execute, fn, job.payload, *factory)] = job
+
+    def _fail(self, job: Job, error: str, retry: bool = True):
+        self.failed += 1
+        logger.warning("job %s (%s) failed, attempt %d of %d: %s", job.id, job.name, job.attempts, job.max_attempts, error)
+        self.backend.fail(job, error, retry)
+
+    def _finish(self, job: Job, future):
+        error = future.exception()
+        if error is None:
+            self.completed += 1
+            self.backend.complete(job)
+        else:
+            self._fail(job, "".join(traceback.format_exception(error)).strip())
+
+    def run(self, stop: Optional[threading.Event] = None, until_idle: bool = False):
+        """Process jobs until `stop` is set, or with until_idle, until none are ready.
+
+        On stop no new jobs are claimed; running ones are finished first.
+        """
+        stop = stop or threading.Event()
+        inflight = {}
+        with self._executor() as executor:
+            while True:
+                claimed = []
+                if not stop.is_set() and len(inflight) < self.concurrency:
+                    try:
+                        claimed = self.backend.claim(self.worker_id, self.concurrency - len(inflight), self.visibility_timeout)
+                    except Exception:
+                        logger.exception("failed to claim jobs")
+                    for job in claimed:
+                        self._submit(executor, inflight, job)
+                if not inflight:
+                    if stop.is_set() or (until_idle and not claimed):
+                        return
+                    if not claimed:
+                        stop.wait(self.poll_interval)
+                    continue
+                # Claim again at once while jobs keep coming and slots are free.
+                timeout = 0 if claimed and len(inflight) < self.concurrency else self.poll_interval
+                done, _ = wait(inflight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = inflight.pop(future)
+                    try:
+                        self._finish(job, future)
+                    except Exception:
+                        # The claim runs out and the job is retried.
+                        logger.exception("failed to settle job %s", job.id)
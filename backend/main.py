@@ -1,10 +1,31 @@
+import os
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from backend import database, metrics, reminders
 from backend.Controller import TaskController, LabelController, UserController
+from backend.Service import hashService
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import MutableHeaders
+
+@asynccontextmanager
+async def lifespan(app):
+    # The reminder scheduler shares the server's event loop (REMINDERS_ENABLED).
+    if reminders.REMINDERS_ENABLED:
+        await reminders.scheduler.start()
+    try:
+        yield
+    finally:
+        await reminders.scheduler.stop()
+        # bcrypt worker processes are started on first use; stop them with the app.
+        hashService.pool.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 origins = [
@@ -20,6 +41,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Responses smaller than GZIP_MINIMUM_SIZE bytes are sent as is.
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", 1024))
+GZIP_COMPRESS_LEVEL = int(os.getenv("GZIP_COMPRESS_LEVEL", 5))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
+
+# The two middlewares below are plain ASGI rather than @app.middleware("http"):
+# that wrapper runs the app in an extra task behind a memory stream, which
+# costs every open /tasks/stream connection for as long as it stays open.
+
+class ReadYourWritesMiddleware:
+    """Pins the caller to the primary for READ_AFTER_WRITE_WINDOW seconds after
+    any write, with a cookie on the write's response, so GETs served by the read
+    engine see their own changes whichever worker handles them."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS"):
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("set-cookie", database.read_primary_cookie())
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+class MetricsMiddleware:
+    """Records request metrics and adds a Server-Timing header; wraps everything else."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = metrics.RequestStats(scope["path"])
+        token = metrics.current_request.set(stats)
+        start = time.perf_counter()
+        started = False
+
+        def observe(status):
+            elapsed = time.perf_counter() - start
+            metrics.observe_request(scope["method"], metrics.route_template(scope), status, stats, elapsed)
+            return elapsed
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                elapsed = observe(message["status"])
+                # Streaming bodies are produced after the headers, so their SQL is only in /metrics.
+                MutableHeaders(scope=message)["Server-Timing"] = metrics.server_timing(stats, elapsed)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not started:
+                observe(500)
+            raise
+        finally:
+            metrics.current_request.reset(token)
+
+app.add_middleware(ReadYourWritesMiddleware)
+# Added last so it wraps the other middleware and sees the whole request.
+app.add_middleware(MetricsMiddleware)
+
+for name, instrumented in {
+    "primary": database.engine,
+    "primary_async": database.async_engine.sync_engine,
+    "read": database.read_engine,
+    "read_async": database.async_read_engine.sync_engine,
+}.items():
+    # Read engines are the primary ones unless READ_DATABASE_URL is set.
+    if instrumented not in metrics.engines.values():
+        metrics.instrument_engine(instrumented, name)
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 app.include_router(UserController.router, prefix="/users", tags=["users"])
 
 app.include_router(TaskController.router, prefix="/tasks", tags=["tasks"])
@@ -0,0 +1,113 @@
+"""Maintenance commands.
+
+    python -m backend.manage rebuild-label-counts [--user-id ID]
+    python -m backend.manage check-label-counts [--user-id ID]
+    python -m backend.manage prune-change-log [--days DAYS]
+    python -m backend.manage reindex-search
+    python -m backend.manage worker [--concurrency N] [--pool thread|process] [--until-idle]
+    python -m backend.manage enqueue NAME [--payload JSON] [--priority P] [--delay SECONDS]
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+
+from . import jobs
+from .database import SessionLocal
+from .Service import changeService, labelCountService, searchService
+
+
+def rebuild_label_counts(db, args):
+    rows = labelCountService.rebuild(db, user_id=args.user_id)
+    print(f"Rebuilt {rows} label count rows")
+    return 0
+
+
+def check_label_counts(db, args):
+    mismatches = labelCountService.check(db, user_id=args.user_id)
+    for user_id, label_id, stored, actual in mismatches:
+        print(f"user {user_id} label {label_id}: stored {stored}, actual {actual}")
+    print(f"{len(mismatches)} mismatched label count rows")
+    return 1 if mismatches else 0
+
+
+def prune_change_log(db, args):
+    rows = changeService.prune(db, older_than_days=args.days)
+    print(f"Deleted {rows} change log rows older than {args.days:g} days")
+    return 0
+
+
+def reindex_search(db, args):
+    tasks = searchService.reindex(db)
+    print(f"Reindexed {tasks} tasks for search")
+    return 0
+
+
+def run_worker(db, args):
+    stop = threading.Event()
+    # SIGTERM/SIGINT stop claiming; jobs already running are finished.
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    worker = jobs.Worker(concurrency=args.concurrency, pool=args.pool)
+    worker.run(stop, until_idle=args.until_idle)
+    print(f"Completed {worker.completed} jobs, {worker.failed} failed attempts")
+    return 0
+
+
+def enqueue_job(db, args):
+    if args.name not in jobs.handlers:
+        print(f"Unknown job {args.name!r}; known: {', '.join(sorted(jobs.handlers))}")
+        return 1
+    try:
+        payload = json.loads(args.payload)
+    except ValueError as e:
+        print(f"Invalid --payload: {e}")
+        return 1
+    jobs.enqueue(args.name, payload, priority=args.priority, delay=args.delay)
+    print(f"Queued {args.name}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-label-counts", help="recompute user_label_counts from task data")
+    rebuild.add_argument("--user-id", type=int, default=None)
+    rebuild.set_defaults(handler=rebuild_label_counts)
+
+    check = commands.add_parser("check-label-counts", help="report user_label_counts rows that disagree with task data")
+    check.add_argument("--user-id", type=int, default=None)
+    check.set_defaults(handler=check_label_counts)
+
+    prune = commands.add_parser("prune-change-log", help="delete change feed rows past the retention window")
+    prune.add_argument("--days", type=float, default=changeService.CHANGE_LOG_RETENTION_DAYS)
+    prune.set_defaults(handler=prune_change_log)
+
+    reindex = commands.add_parser("reindex-search", help="rebuild the task full-text search index")
+    reindex.set_defaults(handler=reindex_search)
+
+    worker = commands.add_parser("worker", help="run background jobs from the job queue")
+    worker.add_argument("--concurrency", type=int, default=jobs.JOB_CONCURRENCY)
+    worker.add_argument("--pool", choices=("thread", "process"), default=jobs.JOB_POOL)
+    worker.add_argument("--until-idle", action="store_true", help="exit once no job is ready")
+    worker.set_defaults(handler=run_worker)
+
+    enqueue = commands.add_parser("enqueue", help="queue a background job, e.g. from cron")
+    enqueue.add_argument("name")
+    enqueue.add_argument("--payload", default="{}", help="handler keyword arguments as a JSON object")
+    enqueue.add_argument("--priority", type=int, default=0, help="lower runs first")
+    enqueue.add_argument("--delay", type=float, default=0, help="seconds before the job becomes ready")
+    enqueue.set_defaults(handler=enqueue_job)
+
+    args = parser.parse_args(argv)
+    db = SessionLocal()
+    try:
+        return args.handler(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
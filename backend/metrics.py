@@ -0,0 +1,235 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from .cache import caches
+from .events import hub
+from .reminders import scheduler
+from .Service import hashService
+
+logger = logging.getLogger(__name__)
+
+# A request whose slowest statement exceeds this is logged with that statement.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class RequestStats:
+    """SQL issued while serving one request."""
+
+    __slots__ = ("path", "queries", "sql_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.sql_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+
+# Set per request by the middleware. Threadpool endpoints and the async
+# engine's greenlets run with a copy of the request context, so the engine
+# hooks below see the same RequestStats object.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            counts, total = self._values.get(label_values, (None, 0.0))
+            if counts is None:
+                counts = [0] * len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[label_values] = (counts, total + value)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        for label_values, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, [le])} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {counts[-1]}"
+
+
+class Collected:
+    """Values read from a callback at scrape time: fn() -> {label_values: value}."""
+
+    def __init__(self, name: str, help: str, labels, fn, kind: str = "gauge"):
+        self.name, self.help, self.labels, self.fn, self.kind = name, help, tuple(labels), fn, kind
+        registry.append(self)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for label_values, value in sorted(self.fn().items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+registry = []
+engines = {}
+
+http_requests = Counter("http_requests_total", "HTTP requests handled.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"))
+request_queries = Histogram(
+    "db_queries_per_request", "SQL statements issued per HTTP request.", ("route",), buckets=QUERY_COUNT_BUCKETS
+)
+request_sql_time = Histogram("db_request_sql_seconds", "Total SQL time per HTTP request.", ("route",))
+query_latency = Histogram("db_query_duration_seconds", "Duration of individual SQL statements.", ("engine",))
+pool_checkout = Histogram("db_pool_checkout_seconds", "Time spent waiting for a pooled connection.", ("engine",))
+
+Collected(
+    "db_pool_checked_out", "Connections currently checked out of the pool.", ("engine",),
+    lambda: {(name,): engine.pool.checkedout() for name, engine in engines.items() if hasattr(engine.pool, "checkedout")},
+)
+Collected("cache_hits_total", "Lookups served from the cache.", ("cache",),
+          lambda: {(name,): cache.hits for name, cache in caches.items()}, kind="counter")
+Collected("cache_misses_total", "Lookups that missed the cache.", ("cache",),
+          lambda: {(name,): cache.misses for name, cache in caches.items()}, kind="counter")
+Collected("cache_entries", "Entries currently cached.", ("cache",),
+          lambda: {(name,): len(cache) for name, cache in caches.items()})
+Collected(
+    "cache_hit_ratio", "Share of lookups served from the cache since start.", ("cache",),
+    lambda: {(name,): cache.hits / (cache.hits + cache.misses) for name, cache in caches.items() if cache.hits + cache.misses},
+)
+Collected("sse_connections", "Open /tasks/stream connections on this worker.", (), lambda: {(): len(hub)})
+Collected("sse_events_published_total", "Change events fanned out to streams.", (),
+          lambda: {(): hub.published}, kind="counter")
+Collected("sse_subscribers_dropped_total", "Streams closed for falling behind.", (),
+          lambda: {(): hub.dropped}, kind="counter")
+Collected("reminders_scheduled", "Deadlines held in the reminder timer heap.", (), lambda: {(): len(scheduler)})
+Collected("reminders_fired_total", "Reminder deadlines reached by the scheduler.", (),
+          lambda: {(): scheduler.fired}, kind="counter")
+Collected("reminders_recorded_total", "Reminders written after checking the task.", (),
+          lambda: {(): scheduler.recorded}, kind="counter")
+Collected("password_hash_pool", "Password hashing pool state.", ("stat",),
+          lambda: {(stat,): value for stat, value in hashService.pool.stats().items()})
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def instrument_engine(engine, name: str):
+    """Time every statement and pool checkout on `engine` (pass sync_engine for async engines)."""
+    if name in engines:
+        return
+    engines[name] = engine
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+        query_latency.observe(seconds, name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.record(statement, seconds)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    # Connection() checks out through engine.raw_connection(); wrapping it on
+    # the instance measures pool waits and survives dispose() swapping pools.
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        start = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            pool_checkout.observe(time.perf_counter() - start, name)
+
+    engine.raw_connection = timed_raw_connection
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    # Routes of a router included with a prefix may only carry their own part
+    # of the template; recover the prefix from where the route's regex matches.
+    path = scope["path"]
+    for i, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[i:]):
+            return path[:i] + path_format
+    return path_format
+
+
+def server_timing(stats: RequestStats, total_seconds: float) -> str:
+    return ", ".join([
+        f'db;dur={stats.sql_seconds * 1000:.2f};desc="{stats.queries} queries"',
+        f"db-slowest;dur={stats.slowest_seconds * 1000:.2f}",
+        f"total;dur={total_seconds * 1000:.2f}",
+    ])
+
+
+def observe_request(method: str, route: str, status: int, stats: RequestStats, total_seconds: float):
+    http_requests.inc(method, route, str(status))
+    http_latency.observe(total_seconds, method, route)
+    request_queries.observe(stats.queries, route)
+    request_sql_time.observe(stats.sql_seconds, route)
+    if stats.slowest_seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning("slow query (%.1f ms) in %s %s: %s", stats.slowest_seconds * 1000, method, route,
+                       stats.slowest_statement)
+
+
+def render() -> str:
+    return "\n".join(line for metric in registry for line in metric.render()) + "\n"
@@ -0,0 +1,241 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.Model import models
+from backend.Service import reminderService, taskService
+
+logger = logging.getLogger(__name__)
+
+# Run the scheduler inside this process (see main.lifespan). Enable it on one
+# worker: each scheduler only hears about writes made in its own process.
+REMINDERS_ENABLED = os.getenv("REMINDERS_ENABLED", "false").lower() in ("1", "true", "yes")
+# A reminder fires this long before the task is due.
+REMINDER_LEAD_SECONDS = float(os.getenv("REMINDER_LEAD_SECONDS", 3600))
+# How far past the lead time deadlines are loaded ahead of the clock.
+REMINDER_HORIZON_SECONDS = float(os.getenv("REMINDER_HORIZON_SECONDS", 3600))
+# Most deadlines read per query, and most reminders written per statement.
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", 1000))
+REMINDER_FLUSH_SECONDS = float(os.getenv("REMINDER_FLUSH_SECONDS", 1))
+# On start, open tasks due at most this long ago that have no reminder yet get one.
+REMINDER_CATCHUP_SECONDS = float(os.getenv("REMINDER_CATCHUP_SECONDS", 86400))
+
+
+class ReminderScheduler:
+    """Timer heap of upcoming task deadlines, firing into the reminders table.
+
+    Deadlines are loaded a window at a time in (due_date, id) order; `cursor`
+    is the last key loaded. Anything at or before it is in the heap, anything
+    after it is still in the database and is picked up by a later load, so
+    task writes only have to be pushed when they land at or before the cursor.
+    Heap entries are never removed in place: `_current` holds the due date an
+    entry must still carry to fire, and record() checks the database again
+    before writing, which also covers writes from other processes.
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        lead: float = REMINDER_LEAD_SECONDS,
+        horizon: float = REMINDER_HORIZON_SECONDS,
+        batch_size: int = REMINDER_BATCH_SIZE,
+        flush_interval: float = REMINDER_FLUSH_SECONDS,
+        catchup: float = REMINDER_CATCHUP_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.lead = timedelta(seconds=lead)
+        self.horizon = timedelta(seconds=horizon)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.catchup = timedelta(seconds=catchup)
+        self.fired = 0
+        self.recorded = 0
+        self.cursor = None
+        self._heap = []
+        self._current = {}
+        self._buffer = []
+        self._deferred = []
+        self._loading = False
+        self._loop = None
+        self._task = None
+        self._wake = None
+
+    def __len__(self):
+        return len(self._current)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        if self.session_factory is None:
+            from backend.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._heap, self._current, self._buffer, self._deferred = [], {}, [], []
+        # Writes arriving before the first load are replayed after it.
+        self.cursor, self._loading = None, True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # Whatever already fired is written; the rest is reloaded on the next start.
+        if self._buffer:
+            await self._flush()
+        self._loop = None
+
+    def track(self, changes):
+        """Apply (task_id, due_date, pending) for committed task writes; safe from any thread."""
+        loop = self._loop
+        if loop is None or not changes:
+            return
+        try:
+            loop.call_soon_threadsafe(self._apply, changes)
+        except RuntimeError:
+            # The loop has shut down; the next start reloads from the database.
+            pass
+
+    def _apply(self, changes):
+        if self._loading or self.cursor is None:
+            self._deferred.extend(changes)
+            return
+        for task_id, due_date, pending in changes:
+            due_date = taskService.to_utc(due_date)
+            if pending and due_date is not None and (due_date, task_id) <= self.cursor:
+                self._push(task_id, due_date)
+            else:
+                self._current.pop(task_id, None)
+        self._wake.set()
+
+    def _push(self, task_id: int, due_date: datetime):
+        self._current[task_id] = due_date
+        heapq.heappush(self._heap, (due_date - self.lead, task_id, due_date))
+
+    async def _session_call(self, fn, *args):
+        async with self.session_factory() as db:
+            return await db.run_sync(fn, *args)
+
+    async def _load(self, now: datetime):
+        before = now + self.lead + self.horizon
+        self._loading = True
+        try:
+            if self.cursor is None:
+                # Start back by the catch-up window: deadlines missed while the
+                # scheduler was down fire now, those already recorded are skipped.
+                self.cursor = (now - self.catchup, 0)
+            rows = await self._session_call(reminderService.upcoming, self.cursor, before, self.batch_size)
+            for task_id, due_date in rows:
+                self._push(task_id, due_date)
+            if len(rows) == self.batch_size:
+                # More may be due before `before`; continue after the last key.
+                task_id, due_date = rows[-1]
+                self.cursor = (due_date, task_id)
+            else:
+                self.cursor = (before, 0)
+        finally:
+            self._loading = False
+            deferred, self._deferred = self._deferred, []
+            if deferred:
+                self._apply(deferred)
+
+    def _needs_load(self, now: datetime) -> bool:
+        # Keep at most about one batch in memory, and reload once half the
+        # horizon has gone by.
+        if self.cursor is None:
+            return True
+        return len(self._heap) < self.batch_size and self.cursor[0] < now + self.lead + self.horizon / 2
+
+    async def _flush(self):
+        fired, self._buffer = self._buffer, []
+        try:
+            self.recorded += await self._session_call(reminderService.record, fired)
+        except Exception:
+            logger.exception("failed to record %d reminders", len(fired))
+            self._buffer = fired + self._buffer
+
+    async def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                now = models.utcnow()
+                if self._needs_load(now):
+                    await self._load(now)
+                    continue
+                while self._heap and self._heap[0][0] <= now:
+                    _, task_id, due_date = heapq.heappop(self._heap)
+                    if self._current.get(task_id) == due_date:
+                        del self._current[task_id]
+                        self._buffer.append((task_id, due_date))
+                        self.fired += 1
+                if self._buffer and (
+                    len(self._buffer) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval
+                ):
+                    await self._flush()
+                    last_flush = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("reminder scheduler iteration failed")
+                await asyncio.sleep(self.flush_interval)
+                continue
+
+            # Sleep until the next deadline, the next load or the next flush,
+            # whichever is first; a pushed write wakes the loop early.
+            timeouts = [self.horizon.total_seconds()]
+            if len(self._heap) < self.batch_size:
+                timeouts.append((self.cursor[0] - self.lead - self.horizon / 2 - now).total_seconds())
+            if self._heap:
+                timeouts.append((self._heap[0][0] - now).total_seconds())
+            if self._buffer:
+                timeouts.append(self.flush_interval - (time.monotonic() - last_flush))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, min(timeouts)))
+            except asyncio.TimeoutError:
+                pass
+
+
+scheduler = ReminderScheduler()
+
+
+def stage(db: Session, changes):
+    """Queue (task_id, due_date, pending) schedule updates, applied once `db` commits.
+
+    pending is False for tasks that are closed or inactive; a rollback
+    discards the updates.
+    """
+    db.info.setdefault("pending_reminders", []).extend(changes)
+
+
+def stage_tasks(db: Session, tasks):
+    stage(db, [
+        (task.id, task.due_date, bool(task.is_active) and task.status != models.TaskStatus.DONE) for task in tasks
+    ])
+
+
+@event.listens_for(Session, "after_commit")
+def _track_after_commit(session):
+    changes = session.info.pop("pending_reminders", None)
+    if changes:
+        scheduler.track(changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop("pending_reminders", None)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import List, Optional
-from datetime import datetime
+from functools import lru_cache
+from pydantic import BaseModel, EmailStr, ConfigDict, Field, TypeAdapter, create_model, field_validator
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 from enum import Enum
 
 class TaskStatus(str, Enum):
@@ -8,6 +9,45 @@ class TaskStatus(str, Enum):
     DOING = "DOING"
     DONE = "DONE"
 
+class TaskSortKey(str, Enum):
+    CREATED_AT = "created_at"
+    DUE_DATE = "due_date"
+
+class TotalMode(str, Enum):
+    EXACT = "exact"    # COUNT on every request
+    CACHED = "cached"  # per-user count reused for a short TTL, may be slightly stale
+    NONE = "none"      # skip counting, total is null
+
+class DuePreset(str, Enum):
+    OVERDUE = "overdue"      # due before now and not DONE
+    TODAY = "today"          # due during the current day in the caller's time zone
+    THIS_WEEK = "this_week"  # due Monday to Sunday of the current week
+
+class LabelMatch(str, Enum):
+    ANY = "any"
+    ALL = "all"
+
+class TaskFilter(BaseModel):
+    """Filters for task lists. Ranges are half-open: after <= value < before, in UTC."""
+    model_config = ConfigDict(frozen=True)
+
+    due_after: Optional[datetime] = None
+    due_before: Optional[datetime] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    exclude_done: bool = False
+    label_ids: Tuple[int, ...] = ()
+    label_match: LabelMatch = LabelMatch.ANY
+
+class ChangeEntity(str, Enum):
+    TASK = "task"
+    LABEL = "label"
+
+class ChangeOp(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"          # gone, or no longer visible to this user
+    DEACTIVATE = "deactivate"  # still exists but left the active list
+
 class UserBase(BaseModel):
     email: EmailStr
     first_name: str
@@ -17,12 +57,15 @@ class UserCreate(UserBase):
     password: str
 
 class User(UserBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
+    # Output only: addresses were validated as EmailStr when they were stored,
+    # and re-running the email validator on every owner and participant was
+    # most of the cost of serializing a task list.
+    email: str = Field(json_schema_extra={"format": "email"})
     # tasks: List[Task] = [] # Avoid circular dependency
 
-    class Config:
-        orm_mode = True
-
 class UserInDB(User):
     hashed_password: str
 
@@ -33,6 +76,14 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite stores an aware datetime's wall-clock time and drops its offset,
+    # and every due-date comparison reads stored values as UTC, so offsets
+    # are applied before the value reaches the database.
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class TaskBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -40,6 +91,8 @@ class TaskBase(BaseModel):
     progress: int = 0
     due_date: Optional[datetime] = None
 
+    _due_date_utc = field_validator("due_date")(_naive_utc)
+
 class TaskCreate(TaskBase):
     labels: Optional[List[str]] = []
 
@@ -50,6 +103,8 @@ class TaskUpdate(BaseModel):
     progress: Optional[int] = None
     due_date: Optional[datetime] = None
 
+    _due_date_utc = field_validator("due_date")(_naive_utc)
+
 class LabelBase(BaseModel):
     name: str
     color: Optional[str] = None
@@ -64,10 +119,9 @@ class TaskAddLabel(BaseModel):
     label_name: str
 
 class Label(LabelBase):
-    id: int
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        orm_mode = True
+    id: int
 
 class LabelWithCount(Label):
     count: int
@@ -76,6 +130,8 @@ class TaskAddParticipant(BaseModel):
     email: EmailStr
 
 class Task(TaskBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -83,9 +139,85 @@ class Task(TaskBase):
     labels: List[Label] = []
     participants: List[User] = []
 
-    class Config:
-        orm_mode = True
+class TaskBulkItemResult(BaseModel):
+    index: int
+    task: Optional[Task] = None
+    error: Optional[str] = None
+
+class TaskBulkResult(BaseModel):
+    created: int
+    results: List[TaskBulkItemResult]
+
+class Change(BaseModel):
+    seq: int
+    entity: ChangeEntity
+    entity_id: int
+    op: ChangeOp
+    # Current state for upserts; tombstones carry only the id.
+    task: Optional[Task] = None
+    label: Optional[Label] = None
+
+class ChangeFeed(BaseModel):
+    changes: List[Change]
+    next_cursor: str
+    has_more: bool
+    # The cursor is missing or older than the retained log: refetch
+    # /tasks/all, then follow the feed from next_cursor.
+    resync_required: bool = False
 
 class TaskPagination(BaseModel):
     tasks: List[Task]
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class TaskSearchPage(BaseModel):
+    tasks: List[Task]
+    has_more: bool
+
+class DueCount(BaseModel):
+    total: int
+    open: int  # not DONE
+
+class ProgressBucket(BaseModel):
+    min: int
+    max: int
+    count: int
+
+class TaskStats(BaseModel):
     total: int
+    by_status: Dict[TaskStatus, int]
+    overdue: int
+    due_today: DueCount
+    due_this_week: DueCount
+    progress: List[ProgressBucket]
+
+# Built once at import; use these instead of per-call model_validate loops.
+TaskAdapter = TypeAdapter(Task)
+TaskListAdapter = TypeAdapter(List[Task])
+
+# Sparse fieldsets: ?fields=title,status renders only those Task fields (id is
+# always included).
+TASK_FIELDS = tuple(Task.model_fields)
+
+def parse_task_fields(fields: str) -> frozenset:
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(TASK_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown task fields: {', '.join(sorted(unknown))}")
+    return frozenset(requested | {"id"})
+
+@lru_cache(maxsize=256)
+def task_fields_adapters(fields: frozenset):
+    """(list adapter, pagination adapter) for Task restricted to `fields`."""
+    model = create_model(
+        "TaskFields",
+        __config__=ConfigDict(from_attributes=True),
+        **{name: (info.annotation, info) for name, info in Task.model_fields.items() if name in fields},
+    )
+    pagination = create_model(
+        "TaskFieldsPagination",
+        tasks=(List[model], ...),
+        total=(Optional[int], None),
+        next_cursor=(Optional[str], None),
+    )
+    return TypeAdapter(List[model]), TypeAdapter(pagination)
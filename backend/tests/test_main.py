@@ -1,23 +1,51 @@
+import asyncio
+import json
+
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-from ..database import Base, get_db
+from .. import database, events, jobs, metrics, reminders
+from ..Model import models
+from ..Service import (
+    authService, changeService, hashService, labelCountService, labelService, searchService, taskService,
+)
+from ..database import (
+    SQLITE_PRAGMAS, Base, build_async_engine, build_engine, get_async_db, get_async_read_db, get_db, get_read_db,
+)
 from ..main import app
+from .utils import assert_max_queries, count_queries
 
-# Setup in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite://"
+# Throwaway SQLite file, so the sync and async engines see the same database;
+# removed with its directory once the module's tests are done.
+TEST_DB_DIR = tempfile.TemporaryDirectory()
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(TEST_DB_DIR.name, 'test.db')}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient may run each request on a fresh event loop
+async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base.metadata.create_all(bind=engine)
 
+# Pass to count_queries/assert_max_queries to see statements from both paths
+all_engines = (engine, async_engine.sync_engine)
+metrics.instrument_engine(engine, "test")
+metrics.instrument_engine(async_engine.sync_engine, "test_async")
+
 def override_get_db():
     try:
         db = TestingSessionLocal()
@@ -25,10 +53,24 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def test_database():
+    yield
+    engine.dispose()
+    asyncio.run(async_engine.dispose())
+    TEST_DB_DIR.cleanup()
+
 def test_register_user():
     response = client.post(
         "/users/register",
@@ -195,3 +237,798 @@ def test_delete_task():
     # Verify it's gone
     response = client.get(f"/tasks/{task_id}", headers=headers)
     assert response.status_code == 404
+
+def test_task_list_query_budget():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.post(
+        "/users/register",
+        json={
+            "email": "budget@example.com",
+            "password": "password123",
+            "first_name": "Budget",
+            "last_name": "User"
+        },
+    )
+    for i in range(15):
+        response = client.post(
+            "/tasks/",
+            json={"title": f"Budget Task {i}", "labels": ["Budget", f"Budget {i % 3}"]},
+            headers=headers,
+        )
+        client.post(
+            f"/tasks/{response.json()['id']}/participants",
+            json={"email": "budget@example.com"},
+            headers=headers,
+        )
+
+    # auth lookup (cold cache) + ETag version + count + tasks/owner + labels + participants, regardless of page size
+    with assert_max_queries(6, *all_engines):
+        response = client.get("/tasks/", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["tasks"]) >= 15
+
+    with assert_max_queries(5, *all_engines):
+        response = client.get("/tasks/all", headers=headers)
+    assert response.status_code == 200
+    assert all(t["participants"] for t in response.json() if t["title"].startswith("Budget Task"))
+
+def auth_headers_for(email):
+    client.post(
+        "/users/register",
+        json={"email": email, "password": "password123", "first_name": "Cursor", "last_name": "User"},
+    )
+    response = client.post("/users/token", data={"username": email, "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_read_tasks_cursor_pagination():
+    headers = auth_headers_for("cursor@example.com")
+    due_dates = ["2030-01-02T00:00:00", None, "2030-01-01T00:00:00", None, "2030-01-02T00:00:00"]
+    created = [
+        client.post("/tasks/", json={"title": f"Cursor {i}", "due_date": due}, headers=headers).json()["id"]
+        for i, due in enumerate(due_dates)
+    ]
+
+    for sort, expected in [
+        ("created_at", created),
+        ("due_date", [created[2], created[0], created[4], created[1], created[3]]),
+    ]:
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, "sort": sort, "total_mode": "none"}
+            if cursor:
+                params["after"] = cursor
+            data = client.get("/tasks/", params=params, headers=headers).json()
+            assert data["total"] is None
+            seen += [t["id"] for t in data["tasks"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == expected
+
+    data = client.get("/tasks/", params={"total_mode": "cached"}, headers=headers).json()
+    assert data["total"] == 5
+
+    response = client.get("/tasks/", params={"after": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+def test_stream_all_tasks_ndjson(monkeypatch):
+    monkeypatch.setattr(taskService, "TASK_EXPORT_BATCH_SIZE", 2)
+    headers = auth_headers_for("stream@example.com")
+    for i in range(5):
+        client.post("/tasks/", json={"title": f"Stream {i}", "labels": ["Stream"]}, headers=headers)
+
+    response = client.get("/tasks/all/stream", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["title"] for r in rows] == [f"Stream {i}" for i in range(5)]
+    assert all(r["labels"][0]["name"] == "Stream" for r in rows)
+    assert rows == client.get("/tasks/all", headers=headers).json()
+
+def test_current_user_cache():
+    headers = auth_headers_for("cached@example.com")
+    assert client.get("/users/me", headers=headers).status_code == 200
+    hits = authService.user_cache.hits
+
+    with count_queries(*all_engines) as statements:
+        response = client.get("/users/me", headers=headers)
+    assert response.json()["first_name"] == "Cursor"
+    assert statements == []
+    assert authService.user_cache.hits == hits + 1
+
+    # Any change to the user row drops the cached entry.
+    db = TestingSessionLocal()
+    db.query(models.User).filter(models.User.email == "cached@example.com").one().first_name = "Renamed"
+    db.commit()
+    db.close()
+    assert client.get("/users/me", headers=headers).json()["first_name"] == "Renamed"
+
+def test_login_rehashes_outdated_bcrypt_cost():
+    auth_headers_for("rehash@example.com")
+    db = TestingSessionLocal()
+    user = db.query(models.User).filter(models.User.email == "rehash@example.com").one()
+    user.hashed_password = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("password123")
+    db.commit()
+
+    completed = hashService.pool.stats()["completed"]
+    response = client.post("/users/token", data={"username": "rehash@example.com", "password": "password123"})
+    assert response.status_code == 200
+    assert hashService.pool.stats()["completed"] == completed + 1
+
+    db.refresh(user)
+    assert user.hashed_password.startswith(f"$2b${hashService.BCRYPT_ROUNDS:02d}$")
+    db.close()
+
+    response = client.post("/users/token", data={"username": "rehash@example.com", "password": "wrong"})
+    assert response.status_code == 401
+
+def test_create_tasks_bulk():
+    headers = auth_headers_for("bulk@example.com")
+    client.post("/tasks/", json={"title": "Existing label", "labels": ["Bulk Existing"]}, headers=headers)
+    items = [
+        {"title": f"Bulk {i}", "labels": ["Bulk Existing", f"Bulk New {i % 2}", f"Bulk New {i % 2}"]}
+        for i in range(20)
+    ]
+    items.insert(3, {"description": "missing title"})
+    items.insert(7, {"title": "bad status", "status": "NOPE"})
+
+    # Fixed cost for any item count; the last two are the change-feed inserts
+    # for the new labels and the new tasks.
+    with assert_max_queries(12, *all_engines):
+        response = client.post("/tasks/bulk", json=items, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 20
+    assert [r["index"] for r in data["results"]] == list(range(22))
+    assert data["results"][3]["task"] is None and "title" in data["results"][3]["error"]
+    assert data["results"][7]["task"] is None and "status" in data["results"][7]["error"]
+
+    created = [r["task"] for r in data["results"] if r["task"]]
+    assert [t["title"] for t in created] == [f"Bulk {i}" for i in range(20)]
+    assert sorted(l["name"] for l in created[1]["labels"]) == ["Bulk Existing", "Bulk New 1"]
+    labels = client.get("/labels/", params={"limit": 1000}, headers=headers).json()
+    assert sum(l["name"].startswith("Bulk") for l in labels) == 3
+
+    # Items are validated one by one, but the body is still documented as TaskCreate[].
+    body = app.openapi()["paths"]["/tasks/bulk"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+    assert body["items"] == {"$ref": "#/components/schemas/TaskCreate"}
+    assert "TaskCreate" in app.openapi()["components"]["schemas"]
+
+def test_lifespan_stops_hashing_pool():
+    # bcrypt worker processes start on first use and stop with the app.
+    with TestClient(app) as app_client:
+        auth_headers_for("lifespan@example.com")
+        assert app_client.post("/users/token", data={"username": "lifespan@example.com", "password": "wrong"}).status_code == 401
+        assert hashService.pool._executor is not None
+    assert hashService.pool._executor is None
+
+def test_resolve_label_ids_uses_catalog():
+    db = TestingSessionLocal()
+    with count_queries(engine) as statements:
+        ids = labelService.resolve_label_ids(db, ["Catalog A", "Catalog B", "Catalog A"])
+        db.commit()
+    assert list(ids) == ["Catalog A", "Catalog B"]
+    # SELECT ... IN, INSERT ... ON CONFLICT DO NOTHING, read-back SELECT, change-feed INSERT
+    assert len([s for s in statements if not s.startswith(("BEGIN", "COMMIT"))]) == 4
+
+    assert labelService.resolve_label_ids(db, ["Catalog A", "Catalog B"]) == ids
+    with count_queries(engine) as statements:
+        assert labelService.resolve_label_ids(db, ["Catalog A", "Catalog B"]) == ids
+    assert statements == []
+    db.close()
+
+    headers = auth_headers_for("catalog@example.com")
+    response = client.put(f"/labels/{ids['Catalog A']}", json={"name": "Catalog Renamed"}, headers=headers)
+    assert response.status_code == 200
+    db = TestingSessionLocal()
+    renamed = labelService.resolve_label_ids(db, ["Catalog A"])
+    db.commit()
+    db.close()
+    assert renamed["Catalog A"] != ids["Catalog A"]
+
+def test_label_usage_counts_stay_consistent():
+    owner = auth_headers_for("counts-owner@example.com")
+    friend = auth_headers_for("counts-friend@example.com")
+    friend_id = client.get("/users/me", headers=friend).json()["id"]
+
+    task = client.post("/tasks/", json={"title": "Counted", "labels": ["Count A", "Count B"]}, headers=owner).json()
+    other = client.post("/tasks/", json={"title": "Counted 2", "labels": ["Count A"]}, headers=owner).json()
+    client.post(f"/tasks/{task['id']}/participants", json={"email": "counts-friend@example.com"}, headers=owner)
+    client.post(f"/tasks/{task['id']}/add_label", json={"label_name": "Count C"}, headers=friend)
+    label_b = next(l["id"] for l in task["labels"] if l["name"] == "Count B")
+    client.delete(f"/tasks/{task['id']}/labels/{label_b}", headers=owner)
+
+    def counts(headers):
+        rows = client.get("/labels/with_count", headers=headers).json()
+        return {r["name"]: r["count"] for r in rows if r["name"].startswith("Count ")}
+
+    assert counts(owner) == {"Count A": 2, "Count C": 1}
+    assert counts(friend) == {"Count A": 1, "Count C": 1}
+
+    client.delete(f"/tasks/{task['id']}/participants/{friend_id}", headers=owner)
+    assert counts(friend) == {}
+    client.delete(f"/tasks/{other['id']}", headers=owner)
+    assert counts(owner) == {"Count A": 1, "Count C": 1}
+
+    db = TestingSessionLocal()
+    assert labelCountService.check(db) == []
+    assert labelCountService.rebuild(db) > 0
+    assert labelCountService.check(db) == []
+    db.close()
+
+def test_tuned_sqlite_profile_sets_pragmas(tmp_path):
+    url = f"sqlite:///{tmp_path / 'profile.db'}"
+    tuned = build_engine(url, profile="tuned")
+    plain = build_engine(url.replace("profile.db", "plain.db"), profile="default")
+    try:
+        with tuned.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == SQLITE_PRAGMAS["busy_timeout"]
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        with plain.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    finally:
+        tuned.dispose()
+        plain.dispose()
+
+    async def async_synchronous_level():
+        async_tuned = build_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://", 1), profile="tuned")
+        try:
+            async with async_tuned.connect() as conn:
+                return (await conn.exec_driver_sql("PRAGMA synchronous")).scalar()
+        finally:
+            await async_tuned.dispose()
+
+    assert asyncio.run(async_synchronous_level()) == 1
+
+def test_reads_use_replica_except_after_own_writes(monkeypatch, tmp_path):
+    # A second, empty SQLite file stands in for a replica that has not caught up.
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica = create_engine(replica_url, connect_args={"check_same_thread": False})
+    async_replica = create_async_engine(replica_url.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=NullPool)
+    Base.metadata.create_all(bind=replica)
+
+    headers = auth_headers_for("replica@example.com")
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(database, "AsyncSessionLocal", TestingAsyncSessionLocal)
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(autoflush=False, bind=replica))
+    monkeypatch.setattr(database, "AsyncReadSessionLocal", async_sessionmaker(async_replica, expire_on_commit=False))
+    monkeypatch.delitem(app.dependency_overrides, get_read_db)
+    monkeypatch.delitem(app.dependency_overrides, get_async_read_db)
+    client.cookies.delete(database.READ_PRIMARY_COOKIE)
+
+    try:
+        assert client.get("/tasks/", headers=headers).json()["total"] == 0
+
+        created = client.post("/tasks/", json={"title": "Mine"}, headers=headers)
+        assert created.status_code == 200
+        pin = created.cookies[database.READ_PRIMARY_COOKIE]
+        assert client.get("/tasks/", headers=headers).json()["total"] == 1
+        assert len(client.get("/tasks/all/stream", headers=headers).text.splitlines()) == 1
+
+        # The pin travels with the client, not the worker: a fresh client
+        # carrying the cookie reads from the primary too.
+        with TestClient(app, cookies={database.READ_PRIMARY_COOKIE: pin}) as other_worker:
+            assert other_worker.get("/tasks/", headers=headers).json()["total"] == 1
+
+        # Once the window lapses the client is served by the replica again,
+        # even if it keeps sending the cookie.
+        client.cookies.set(database.READ_PRIMARY_COOKIE, "1.0")
+        assert client.get("/tasks/", headers=headers).json()["total"] == 0
+        client.cookies.delete(database.READ_PRIMARY_COOKIE)
+    finally:
+        replica.dispose()
+        asyncio.run(async_replica.dispose())
+
+def test_server_timing_and_metrics():
+    headers = auth_headers_for("metrics@example.com")
+    task_id = client.post("/tasks/", json={"title": "Measured"}, headers=headers).json()["id"]
+
+    with count_queries(*all_engines) as statements:
+        response = client.get(f"/tasks/{task_id}", headers=headers)
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert f'desc="{len(statements)} queries"' in timing
+    assert "db-slowest;dur=" in timing and "total;dur=" in timing
+
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/tasks/{task_id}",status="200"}' in body
+    assert 'db_queries_per_request_count{route="/tasks/{task_id}"}' in body
+    assert 'db_pool_checkout_seconds_count{engine="test"}' in body
+    assert 'cache_hits_total{cache="auth_users"}' in body
+    assert 'password_hash_pool{stat="pending"}' in body
+
+def test_conditional_get_returns_304_until_something_changes():
+    owner = auth_headers_for("etag-owner@example.com")
+    other = auth_headers_for("etag-other@example.com")
+    task_id = client.post("/tasks/", json={"title": "Polled"}, headers=owner).json()["id"]
+
+    def revalidate(url, headers):
+        etag = client.get(url, headers=headers).headers["ETag"]
+        with count_queries(*all_engines) as statements:
+            response = client.get(url, headers={**headers, "If-None-Match": etag})
+        return etag, response, statements
+
+    etag, response, statements = revalidate(f"/tasks/{task_id}", owner)
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+    assert not response.content
+    assert len(statements) <= 2  # auth lookup at most, plus the version query
+
+    for url in ("/tasks/", "/tasks/all", "/labels/with_count", "/labels/"):
+        assert revalidate(url, owner)[1].status_code == 304
+
+    # Label links and participants touch the task, so every dependent ETag moves.
+    list_etag = client.get("/tasks/", headers=owner).headers["ETag"]
+    counts_etag = client.get("/labels/with_count", headers=owner).headers["ETag"]
+    client.post(f"/tasks/{task_id}/add_label", json={"label_name": "etag-label"}, headers=owner)
+    assert client.get(f"/tasks/{task_id}", headers={**owner, "If-None-Match": etag}).status_code == 200
+    assert client.get("/tasks/", headers={**owner, "If-None-Match": list_etag}).status_code == 200
+    assert client.get("/labels/with_count", headers={**owner, "If-None-Match": counts_etag}).status_code == 200
+
+    other_etag = client.get("/tasks/", headers=other).headers["ETag"]
+    client.post(f"/tasks/{task_id}/participants", json={"email": "etag-other@example.com"}, headers=owner)
+    response = client.get("/tasks/", headers={**other, "If-None-Match": other_etag})
+    assert response.status_code == 200 and response.json()["total"] == 1
+
+    # Different query strings are different representations.
+    assert client.get("/tasks/?limit=1", headers={**owner, "If-None-Match": list_etag}).status_code == 200
+
+def test_sparse_fieldsets():
+    headers = auth_headers_for("sparse@example.com")
+    for i in range(3):
+        client.post("/tasks/", json={"title": f"Sparse {i}", "description": "long text", "labels": ["sparse"]}, headers=headers)
+
+    with count_queries(*all_engines) as statements:
+        response = client.get("/tasks/?fields=title,status&limit=2&total_mode=none", headers=headers)
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    data = response.json()
+    assert [set(task) for task in data["tasks"]] == [{"id", "title", "status"}] * 2
+    # No relationship loads, and the deferred description is not selected.
+    task_selects = [s for s in statements if "FROM tasks" in s and "count(" not in s and "max(" not in s]
+    assert len(task_selects) == 1 and "tasks.description" not in task_selects[0]
+    assert not [s for s in statements if "task_labels" in s or "JOIN task_participants" in s]
+
+    # The cursor still works although created_at is not rendered.
+    following = client.get(f"/tasks/?fields=title&limit=2&after={data['next_cursor']}", headers=headers).json()
+    assert following["tasks"][0]["title"] == "Sparse 2"
+
+    all_tasks = client.get("/tasks/all?fields=labels", headers=headers).json()
+    assert all(set(task) == {"id", "labels"} and task["labels"][0]["name"] == "sparse" for task in all_tasks)
+
+    assert client.get("/tasks/?fields=title,secret", headers=headers).status_code == 400
+
+def test_large_responses_are_gzipped():
+    headers = auth_headers_for("gzip@example.com")
+    client.post("/tasks/bulk", json=[{"title": f"Compressible {i}", "description": "x" * 50} for i in range(30)], headers=headers)
+    response = client.get("/tasks/all", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(response.json()) == 30
+
+    small = client.get("/tasks/all?fields=title&is_active=false", headers={**headers, "Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+def test_change_feed():
+    owner = auth_headers_for("changes-owner@example.com")
+    friend = auth_headers_for("changes-friend@example.com")
+
+    def changes(headers, since=None, **params):
+        response = client.get("/tasks/changes", params={"since": since, **params} if since else params, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    # No cursor: the client must do a full fetch first, then resume from here.
+    start = changes(owner)
+    assert start["resync_required"] and start["changes"] == []
+    friend_start = changes(friend)["next_cursor"]
+
+    first = client.post("/tasks/", json={"title": "Feed A"}, headers=owner).json()["id"]
+    second = client.post("/tasks/", json={"title": "Feed B"}, headers=owner).json()["id"]
+    client.put(f"/tasks/{first}", json={"title": "Feed A2"}, headers=owner)
+    feed = changes(owner, start["next_cursor"])
+    # A's two rows collapse into the later one, so A now sorts after B.
+    assert [(c["entity_id"], c["op"]) for c in feed["changes"]] == [(second, "upsert"), (first, "upsert")]
+    assert feed["changes"][1]["task"]["title"] == "Feed A2"
+    assert not feed["has_more"] and not feed["resync_required"]
+    assert changes(friend, friend_start)["changes"] == []
+
+    page = changes(owner, start["next_cursor"], limit=1)
+    assert page["has_more"] and len(page["changes"]) == 1
+    assert changes(owner, page["next_cursor"])["changes"][-1]["entity_id"] == first
+
+    client.put(f"/tasks/{second}/deactivate", headers=owner)
+    client.delete(f"/tasks/{first}", headers=owner)
+    tombstones = changes(owner, feed["next_cursor"])["changes"]
+    assert [(c["entity_id"], c["op"], c["task"]) for c in tombstones] == [(second, "deactivate", None), (first, "delete", None)]
+
+    shared = client.post("/tasks/", json={"title": "Feed Shared"}, headers=owner).json()["id"]
+    friend_id = client.post(f"/tasks/{shared}/participants", json={"email": "changes-friend@example.com"}, headers=owner).json()["participants"][0]["id"]
+    joined = changes(friend, friend_start)
+    assert [(c["entity_id"], c["op"]) for c in joined["changes"]] == [(shared, "upsert")]
+    client.delete(f"/tasks/{shared}/participants/{friend_id}", headers=owner)
+    left = changes(friend, joined["next_cursor"])["changes"]
+    assert [(c["entity_id"], c["op"]) for c in left] == [(shared, "delete")]
+
+    assert client.get("/tasks/changes", params={"since": "not-a-cursor"}, headers=owner).status_code == 400
+    assert client.get("/tasks/changes", params={"since": changeService.encode_cursor(1, 2, 3)}, headers=owner).status_code == 400
+    # A (txid, seq) cursor is only issued on Postgres; elsewhere it means resync.
+    assert changes(owner, changeService.encode_cursor(1, 2))["resync_required"]
+
+    # Once the log is pruned past a cursor, that client has to resync.
+    db = TestingSessionLocal()
+    assert changeService.prune(db, older_than_days=0) > 0
+    db.close()
+    assert changes(owner, start["next_cursor"])["resync_required"]
+
+def test_change_stream():
+    owner = auth_headers_for("stream-owner@example.com")
+    auth_headers_for("stream-friend@example.com")
+    task_id = client.post("/tasks/", json={"title": "Streamed"}, headers=owner).json()["id"]
+
+    # TestClient buffers whole responses, so the endless stream is driven at the ASGI level.
+    async def scenario():
+        disconnect = asyncio.Event()
+        messages = asyncio.Queue()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await messages.put(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/tasks/stream", "raw_path": b"/tasks/stream", "query_string": b"", "root_path": "",
+            "headers": [(b"authorization", owner["Authorization"].encode())],
+            "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        app_task = asyncio.create_task(app(scope, receive, send))
+        start = await asyncio.wait_for(messages.get(), 5)
+        assert start["status"] == 200 and (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+        assert (await asyncio.wait_for(messages.get(), 5))["body"].startswith(b"retry:")
+        assert len(events.hub) == 1
+
+        # Writes commit on another thread; their events arrive once committed.
+        await asyncio.to_thread(client.put, f"/tasks/{task_id}", json={"title": "Streamed 2"}, headers=owner)
+        body = (await asyncio.wait_for(messages.get(), 5))["body"].decode()
+        assert body.startswith("event: upsert\n") and json.loads(body.split("data: ")[1]) == {
+            "entity": "task", "entity_id": task_id, "op": "upsert"
+        }
+        # Another user's task is not pushed to this stream.
+        await asyncio.to_thread(client.post, "/tasks/", json={"title": "Not mine"}, headers=auth_headers_for("stream-friend@example.com"))
+        await asyncio.to_thread(client.delete, f"/tasks/{task_id}", headers=owner)
+        body = (await asyncio.wait_for(messages.get(), 5))["body"].decode()
+        assert body.startswith("event: delete\n") and f'"entity_id": {task_id}' in body
+
+        disconnect.set()
+        await asyncio.wait_for(app_task, 5)
+        assert len(events.hub) == 0
+
+    asyncio.run(scenario())
+
+    # A subscriber that stops reading is dropped instead of growing its queue.
+    async def slow_consumer():
+        hub = events.Hub(queue_size=2)
+        subscription = hub.subscribe(7)
+        hub.publish([(7, "task", i, "upsert") for i in range(3)])
+        await asyncio.sleep(0)
+        assert subscription.dropped and hub.dropped == 1
+        assert subscription.queue.get_nowait() is events.OVERFLOW
+
+        full = events.Hub(max_connections=1)
+        assert full.subscribe(1) is not None and full.subscribe(2) is None
+
+    asyncio.run(slow_consumer())
+
+def test_search_tasks():
+    owner = auth_headers_for("search-owner@example.com")
+    other = auth_headers_for("search-other@example.com")
+    in_title = client.post("/tasks/", json={"title": "Quarterly invoice run", "description": "finance"}, headers=owner).json()["id"]
+    in_body = client.post("/tasks/", json={"title": "Finance", "description": "check the invoices"}, headers=owner).json()["id"]
+    client.post("/tasks/bulk", json=[{"title": f"Invoice batch {i}"} for i in range(3)], headers=owner)
+    client.post("/tasks/", json={"title": "Someone else's invoice"}, headers=other)
+
+    def search(headers, **params):
+        response = client.get("/tasks/search", params=params, headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    # Title matches rank above description matches; prefix on the last word.
+    results = search(owner, q="invoice")
+    assert len(results["tasks"]) == 5 and not results["has_more"]
+    assert in_title in [t["id"] for t in results["tasks"]] and results["tasks"][-1]["id"] == in_body
+    assert [t["id"] for t in search(owner, q="check invo")["tasks"]] == [in_body]
+    assert [t["title"] for t in search(other, q="invoice")["tasks"]] == ["Someone else's invoice"]
+
+    first = search(owner, q="invoice", limit=3)
+    rest = search(owner, q="invoice", limit=3, skip=3)
+    assert first["has_more"] and not rest["has_more"]
+    assert len({t["id"] for t in first["tasks"] + rest["tasks"]}) == 5
+
+    # Sharing a task makes it searchable for the participant, and unsharing undoes it.
+    other_id = client.post(f"/tasks/{in_title}/participants", json={"email": "search-other@example.com"}, headers=owner).json()["participants"][0]["id"]
+    assert len(search(other, q="invoice")["tasks"]) == 2
+    client.delete(f"/tasks/{in_title}/participants/{other_id}", headers=owner)
+    assert len(search(other, q="invoice")["tasks"]) == 1
+
+    # Triggers keep the index in step with updates, deactivation and deletes.
+    client.put(f"/tasks/{in_title}", json={"title": "Quarterly report"}, headers=owner)
+    assert in_title not in [t["id"] for t in search(owner, q="invoice")["tasks"]]
+    assert [t["id"] for t in search(owner, q="quarterly")["tasks"]] == [in_title]
+    client.put(f"/tasks/{in_title}/deactivate", headers=owner)
+    assert search(owner, q="quarterly")["tasks"] == []
+    assert [t["id"] for t in search(owner, q="quarterly", is_active=False)["tasks"]] == [in_title]
+    client.delete(f"/tasks/{in_body}", headers=owner)
+    assert search(owner, q="check")["tasks"] == []
+
+    # Operators in user input are plain words, and a query needs at least one.
+    assert search(owner, q='invoice OR "NEAR(')["tasks"] == []
+    assert client.get("/tasks/search", params={"q": "  -- "}, headers=owner).status_code == 400
+
+    db = TestingSessionLocal()
+    assert searchService.reindex(db) > 0
+    db.close()
+    assert len(search(owner, q="invoice")["tasks"]) == 3
+
+def test_task_filters():
+    headers = auth_headers_for("filters@example.com")
+    now = datetime.now(timezone.utc)
+    noon = now.replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def create(title, due=None, status="TODO", labels=()):
+        body = {"title": title, "status": status, "labels": list(labels), "due_date": due.isoformat() if due else None}
+        return client.post("/tasks/", json=body, headers=headers).json()
+
+    late = create("Late", now - timedelta(days=2), labels=["filter-x", "filter-y"])
+    create("Late but done", now - timedelta(days=2), status="DONE")
+    midday = create("Midday", noon, labels=["filter-x"])
+    later = create("Later", now + timedelta(days=10), labels=["filter-y"])
+    create("Someday")
+    label_x, label_y = (next(l["id"] for l in late["labels"] if l["name"] == name) for name in ("filter-x", "filter-y"))
+
+    def titles(**params):
+        response = client.get("/tasks/", params=params, headers=headers)
+        assert response.status_code == 200
+        return {task["title"] for task in response.json()["tasks"]}
+
+    overdue = titles(due="overdue")
+    assert "Late" in overdue and not overdue & {"Late but done", "Later", "Someday"}
+    assert titles(due="today") == {"Midday"}
+    assert "Midday" in titles(due="this_week") and "Later" not in titles(due="this_week")
+    assert titles(due_after=(now + timedelta(days=5)).isoformat()) == {"Later"}
+    # Presets narrow explicit ranges instead of replacing them.
+    assert titles(due="this_week", due_after=(now + timedelta(days=5)).isoformat()) == set()
+    assert len(titles(created_after=(now - timedelta(minutes=5)).isoformat())) == 5
+    assert titles(created_before=(now - timedelta(minutes=5)).isoformat()) == set()
+    assert titles(created_after=midday["created_at"], created_before=later["created_at"]) == {"Midday"}
+
+    assert titles(labels=f"{label_x},{label_y}") == {"Late", "Midday", "Later"}
+    assert titles(labels=f"{label_x},{label_y}", label_match="all") == {"Late"}
+    assert titles(labels=str(label_y), due="overdue") == {"Late"}
+
+    # Offsets are applied on write, so ranges match the UTC instant.
+    instant = (now + timedelta(days=20)).replace(microsecond=0)
+    offset = create("Offset", instant.astimezone(timezone(timedelta(hours=5))))
+    assert offset["due_date"] == instant.replace(tzinfo=None).isoformat()
+    around = {"due_after": (instant - timedelta(hours=1)).isoformat(), "due_before": (instant + timedelta(hours=1)).isoformat()}
+    assert titles(**around) == {"Offset"}
+    assert titles(due_after=(instant + timedelta(hours=4)).isoformat(), due_before=(instant + timedelta(hours=6)).isoformat()) == set()
+
+    page = client.get("/tasks/", params={"labels": f"{label_x},{label_y}", "limit": 2}, headers=headers).json()
+    assert page["total"] == 3
+    assert len(page["tasks"]) + len(client.get(
+        "/tasks/", params={"labels": f"{label_x},{label_y}", "after": page["next_cursor"]}, headers=headers
+    ).json()["tasks"]) == 3
+
+    assert client.get("/tasks/", params={"labels": "x"}, headers=headers).status_code == 400
+    assert client.get("/tasks/", params={"due": "today", "tz": "Mars/Olympus"}, headers=headers).status_code == 400
+
+    # Presets follow the caller's calendar: New York's 2024-03-10 is 23 hours
+    # long (DST starts), 05:00 to 04:00 UTC.
+    window = taskService.build_task_filter(
+        due="today", tz="America/New_York", now=datetime(2024, 3, 10, 12, tzinfo=timezone.utc)
+    )
+    assert (window.due_after, window.due_before) == (
+        datetime(2024, 3, 10, 5, tzinfo=timezone.utc), datetime(2024, 3, 11, 4, tzinfo=timezone.utc)
+    )
+
+def test_task_stats():
+    owner = auth_headers_for("stats-owner@example.com")
+    friend = auth_headers_for("stats-friend@example.com")
+    now = datetime.now(timezone.utc)
+
+    def create(title, due=None, status="TODO", progress=0):
+        body = {"title": title, "status": status, "progress": progress, "due_date": due.isoformat() if due else None}
+        return client.post("/tasks/", json=body, headers=owner).json()
+
+    late = create("Stats late", now - timedelta(days=2))
+    create("Stats done late", now - timedelta(days=2), status="DONE", progress=100)
+    create("Stats soon", now + timedelta(minutes=1), status="DOING", progress=40)
+    create("Stats later", now + timedelta(days=30), status="DOING", progress=80)
+
+    stats = client.get("/tasks/stats", headers=owner).json()
+    assert stats["total"] == 4
+    assert stats["by_status"] == {"TODO": 1, "DOING": 2, "DONE": 1}
+    assert stats["overdue"] == 1
+    assert {b["max"]: b["count"] for b in stats["progress"]} == {0: 1, 25: 0, 50: 1, 75: 0, 99: 1, 100: 1}
+    assert sum(b["count"] for b in stats["progress"]) == stats["total"]
+
+    # Cached: a repeat costs no statements beyond the (cached) auth lookup.
+    with count_queries(*all_engines) as statements:
+        assert client.get("/tasks/stats", headers=owner).json() == stats
+    assert statements == []
+
+    # Writes invalidate the cache of every member, including a new participant.
+    friend_stats = client.get("/tasks/stats", headers=friend).json()
+    assert friend_stats["total"] == 0
+    client.post(f"/tasks/{late['id']}/participants", json={"email": "stats-friend@example.com"}, headers=owner)
+    assert client.get("/tasks/stats", headers=friend).json()["overdue"] == 1
+    client.put(f"/tasks/{late['id']}", json={"status": "DONE"}, headers=friend)
+    assert client.get("/tasks/stats", headers=owner).json()["by_status"]["DONE"] == 2
+    assert client.get("/tasks/stats", headers=friend).json()["overdue"] == 0
+    client.put(f"/tasks/{late['id']}/deactivate", headers=owner)
+    assert client.get("/tasks/stats", headers=friend).json()["total"] == 0
+    assert client.get("/tasks/stats", params={"is_active": False}, headers=owner).json()["total"] == 1
+
+    assert client.get("/tasks/stats", params={"tz": "Mars/Olympus"}, headers=owner).status_code == 400
+
+    # Windows follow the caller's calendar. 2024-03-06 is a Wednesday; all
+    # three tasks fall in its week, two of them on the day itself. The one
+    # sent at Tuesday 23:30 New York time is due Wednesday 04:30 UTC.
+    owner_id = late["owner"]["id"]
+    db = TestingSessionLocal()
+    for title, due, status in (
+        ("Stats wed", "2024-03-06T12:00:00+00:00", "TODO"),
+        ("Stats wed offset", "2024-03-05T23:30:00-05:00", "TODO"),
+        ("Stats fri", "2024-03-08T12:00:00+00:00", "DONE"),
+    ):
+        client.post("/tasks/", json={"title": title, "due_date": due, "status": status}, headers=owner)
+    stats = taskService.get_task_stats(db, owner_id, tz="Asia/Tokyo", now=datetime(2024, 3, 6, 9, tzinfo=timezone.utc))
+    assert stats["due_today"] == {"total": 2, "open": 2}
+    assert stats["due_this_week"] == {"total": 3, "open": 2}
+    # At 16:00 UTC it is still Wednesday in UTC but already Thursday in Tokyo.
+    late_wednesday = datetime(2024, 3, 6, 16, tzinfo=timezone.utc)
+    assert taskService.get_task_stats(db, owner_id, now=late_wednesday)["due_today"]["total"] == 2
+    assert taskService.get_task_stats(db, owner_id, tz="Asia/Tokyo", now=late_wednesday)["due_today"]["total"] == 0
+    db.close()
+
+def test_reminder_scheduler(monkeypatch):
+    headers = auth_headers_for("reminders@example.com")
+    user_id = client.get("/users/me", headers=headers).json()["id"]
+    now = datetime.now(timezone.utc)
+
+    def create(title, due, status="TODO"):
+        body = {"title": title, "status": status, "due_date": due.isoformat()}
+        return client.post("/tasks/", json=body, headers=headers).json()["id"]
+
+    def recorded():
+        with TestingSessionLocal() as db:
+            sent = models.reminders.c
+            return sorted(db.execute(select(sent.task_id).where(sent.user_id == user_id)).scalars())
+
+    async def until(condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError("timed out")
+
+    # An hour's lead and a minute's horizon: tasks due within the hour fire at once.
+    soon = [create(f"Remind {i}", now + timedelta(minutes=10 + i)) for i in range(3)]
+    # Sent with an offset: stored as local time it would look five hours out.
+    soon.append(create("Remind offset", (now + timedelta(minutes=15)).astimezone(timezone(timedelta(hours=5)))))
+    later = create("Remind later", now + timedelta(days=3))
+    create("Remind done", now + timedelta(minutes=20), status="DONE")
+
+    def scheduler():
+        instance = reminders.ReminderScheduler(
+            session_factory=TestingAsyncSessionLocal, lead=3600, horizon=60, batch_size=2, flush_interval=0.01
+        )
+        monkeypatch.setattr(reminders, "scheduler", instance)
+        return instance
+
+    async def first_run():
+        instance = scheduler()
+        await instance.start()
+        # Four due tasks, loaded two per query, written in batches.
+        await until(lambda: recorded() == soon)
+
+        # Writes reach the running heap: a new deadline, one moved into the
+        # window, and one that is cancelled before it fires.
+        added = await asyncio.to_thread(create, "Remind added", (now + timedelta(minutes=5)).astimezone(timezone(timedelta(hours=-7))))
+        await asyncio.to_thread(client.put, f"/tasks/{later}", json={"due_date": (now + timedelta(minutes=1)).isoformat()}, headers=headers)
+        await until(lambda: recorded() == sorted(soon + [added, later]))
+        pending = await asyncio.to_thread(create, "Remind pending", now + timedelta(seconds=3630))
+        await until(lambda: pending in instance._current)
+        await asyncio.to_thread(client.put, f"/tasks/{pending}/deactivate", headers=headers)
+        await until(lambda: pending not in instance._current)
+        await instance.stop()
+        return added
+
+    added = asyncio.run(first_run())
+    # Written while the scheduler is down; the next start picks it up, and
+    # reminders that already fired are not written twice.
+    missed = create("Remind missed", now + timedelta(minutes=2))
+
+    async def second_run():
+        instance = scheduler()
+        await instance.start()
+        await until(lambda: missed in recorded())
+        await instance.stop()
+
+    asyncio.run(second_run())
+    assert recorded() == sorted(soon + [added, later, missed])
+
+def test_job_queue(monkeypatch):
+    backend = jobs.DatabaseBackend(session_factory=TestingSessionLocal)
+    monkeypatch.setattr(jobs, "backend", backend)
+    monkeypatch.setattr(jobs, "JOB_RETRY_BACKOFF_SECONDS", 0)
+    ran = []
+    flaky_calls = []
+
+    def record(db, value):
+        ran.append(value)
+
+    def flaky(db):
+        flaky_calls.append(1)
+        if len(flaky_calls) == 1:
+            raise RuntimeError("first try fails")
+
+    def broken(db):
+        raise RuntimeError("always fails")
+
+    for name, fn in (("test.record", record), ("test.flaky", flaky), ("test.broken", broken)):
+        monkeypatch.setitem(jobs.handlers, name, fn)
+
+    def queued():
+        with TestingSessionLocal() as db:
+            return db.execute(select(models.jobs.c.name, models.jobs.c.status, models.jobs.c.last_error)).all()
+
+    # Jobs queued during a write exist only if it commits.
+    db = TestingSessionLocal()
+    db.execute(insert(models.jobs).values(name="test.record", payload={"value": "rolled back"}, max_attempts=1))
+    jobs.enqueue_after_commit(db, "test.record", {"value": "rolled back"})
+    db.rollback()
+    for value, priority in (("late", 5), ("first", 0), ("second", 1)):
+        jobs.enqueue_after_commit(db, "test.record", {"value": value}, priority=priority)
+    db.commit()
+    db.close()
+    assert len(queued()) == 3
+
+    worker = jobs.Worker(concurrency=1, poll_interval=0.01, session_factory=TestingSessionLocal)
+    worker.run(until_idle=True)
+    assert ran == ["first", "second", "late"]
+    assert queued() == []
+
+    # Failures are retried until max_attempts, then kept as dead with the error.
+    jobs.enqueue("test.flaky")
+    jobs.enqueue("test.broken", max_attempts=2)
+    jobs.enqueue("test.missing")
+    worker.run(until_idle=True)
+    assert len(flaky_calls) == 2
+    dead = {name: error for name, status, error in queued() if status == jobs.DEAD}
+    assert set(dead) == {"test.broken", "test.missing"} and len(queued()) == 2
+    assert "RuntimeError: always fails" in dead["test.broken"]
+
+    # A claim that runs past its visibility timeout is handed out again, and
+    # the first worker can no longer settle it.
+    jobs.enqueue("test.record", {"value": "slow"})
+    stale, = backend.claim("worker-a", 1, visibility_timeout=0)
+    fresh, = backend.claim("worker-b", 1, visibility_timeout=60)
+    assert (stale.id, stale.attempts, fresh.attempts) == (fresh.id, 1, 2)
+    assert backend.claim("worker-c", 1, visibility_timeout=60) == []
+    backend.complete(stale)
+    assert any(name == "test.record" for name, _, _ in queued())
+    backend.complete(fresh)
+    assert all(name != "test.record" for name, _, _ in queued())
+
+    # A backend missing part of the interface fails when it is created.
+    class EnqueueOnly(jobs.JobBackend):
+        def enqueue(self, rows, db=None):
+            pass
+
+    with pytest.raises(TypeError):
+        EnqueueOnly()
@@ -0,0 +1,171 @@
+import os
+import random
+import re
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ..database import Base
+from ..Model import models
+from ..Service import changeService, labelService, reminderService, searchService, taskService, userService
+from .. import schemas
+
+# Runs every service query against a seeded database and fails when the plan
+# falls back to a full table scan. SQLite always runs; set
+# QUERY_PLAN_POSTGRES_URL to a throwaway Postgres database (its tables are
+# dropped and recreated) to check the same queries with EXPLAIN there.
+
+USERS, LABELS, TASKS = 50, 30, 3000
+
+# Queries that still scan, mapped to the reason. An entry that stops scanning
+# on SQLite fails the suite so it gets removed from here.
+KNOWN_FULL_SCANS = {}
+
+QUERIES = {
+    "get_task": lambda db, ids: taskService.get_task(db, ids.task, ids.user),
+    "get_tasks": lambda db, ids: taskService.get_tasks(db, ids.user, status=models.TaskStatus.TODO),
+    "get_tasks_cursor": lambda db, ids: taskService.get_tasks(
+        db, ids.user, after=taskService.encode_cursor(schemas.TaskSortKey.CREATED_AT, datetime(2020, 1, 1), 1),
+        total_mode=schemas.TotalMode.NONE,
+    ),
+    "get_tasks_due_range": lambda db, ids: taskService.get_tasks(
+        db, ids.user, task_filter=taskService.build_task_filter(due=schemas.DuePreset.THIS_WEEK, now=datetime(2024, 1, 3)),
+    ),
+    "get_tasks_labels_any": lambda db, ids: taskService.get_tasks(
+        db, ids.user, task_filter=taskService.build_task_filter(label_ids=[ids.label, ids.label + 1]),
+    ),
+    "get_tasks_labels_all": lambda db, ids: taskService.get_tasks(
+        db, ids.user, task_filter=taskService.build_task_filter(label_ids=[ids.label, ids.label + 1], label_match=schemas.LabelMatch.ALL),
+    ),
+    "get_task_stats": lambda db, ids: taskService.get_task_stats(db, ids.user),
+    "get_all_user_tasks": lambda db, ids: taskService.get_all_user_tasks(db, ids.user),
+    "iter_user_tasks": lambda db, ids: list(taskService.iter_user_tasks(db, ids.user)),
+    "get_task_version": lambda db, ids: taskService.get_task_version(db, ids.task, ids.user),
+    "get_tasks_version": lambda db, ids: taskService.get_tasks_version(db, ids.user),
+    # Postgres cursors are (txid, seq); see changeService.
+    "get_changes": lambda db, ids: changeService.get_changes(db, ids.user, changeService.encode_cursor(
+        *((0,) if db.get_bind().dialect.name == "postgresql" else ()), TASKS // 2,
+    )),
+    "search_tasks": lambda db, ids: searchService.search_tasks(db, ids.user, "task"),
+    "upcoming_reminders": lambda db, ids: reminderService.upcoming(
+        db, (datetime(2024, 1, 10), 0), datetime(2024, 1, 11), 100,
+    ),
+    "record_reminders": lambda db, ids: reminderService.record(db, [(ids.task, datetime(2024, 1, 10))]),
+    "get_label": lambda db, ids: labelService.get_label(db, ids.label),
+    "get_label_by_name": lambda db, ids: labelService.get_label_by_name(db, "label-1"),
+    "resolve_label_ids": lambda db, ids: labelService.resolve_label_ids(db, ["label-2", "label-new"]),
+    "get_labels_with_usage_count": lambda db, ids: labelService.get_labels_with_usage_count(db, ids.user),
+    "get_user": lambda db, ids: userService.get_user(db, ids.user),
+    "get_user_by_email": lambda db, ids: userService.get_user_by_email(db, "user-3@example.com"),
+}
+
+
+def _sqlite_full_scans(plan_rows):
+    offenders = []
+    for row in plan_rows:
+        detail = row[-1]
+        scan = re.match(r"SCAN (\w+)", detail)
+        # CONSTANT ROW is a FROM-less select (e.g. one made of scalar subqueries);
+        # a virtual table scan with a constraint (INDEX 0:M...) is an FTS lookup.
+        if (scan and not scan.group(1).startswith("anon_") and detail != "SCAN CONSTANT ROW"
+                and not re.search(r"VIRTUAL TABLE INDEX \d+:\S", detail)) or "AUTOMATIC" in detail or "ANY(" in detail:
+            offenders.append(detail)
+    return offenders
+
+
+def _postgres_full_scans(plan_rows):
+    return [row[0].strip() for row in plan_rows if "Seq Scan on" in row[0]]
+
+
+def _seed(engine):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(9)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"email": f"user-{i}@example.com", "first_name": "Plan", "last_name": str(i), "hashed_password": "x"}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(insert(models.Label), [{"name": f"label-{i}", "color": "#FFFFFF"} for i in range(1, LABELS + 1)])
+        conn.execute(insert(models.Task), [
+            {
+                "title": f"task-{i}",
+                "user_id": rnd.randint(1, USERS),
+                "status": rnd.choice(list(models.TaskStatus)),
+                "is_active": rnd.random() < 0.8,
+                "due_date": datetime(2024, 1, 1) + timedelta(hours=rnd.randint(0, 24 * 60)) if rnd.random() < 0.7 else None,
+            }
+            for i in range(1, TASKS + 1)
+        ])
+        participants = {(rnd.randint(1, TASKS), rnd.randint(1, USERS)) for _ in range(TASKS)}
+        conn.execute(insert(models.task_participants), [{"task_id": t, "user_id": u} for t, u in participants])
+        links = {(rnd.randint(1, TASKS), rnd.randint(1, LABELS)) for _ in range(TASKS * 2)}
+        conn.execute(insert(models.task_labels), [{"task_id": t, "label_id": l} for t, l in links])
+        conn.execute(insert(models.change_log), [
+            {"user_id": rnd.choice([None] + [rnd.randint(1, USERS)] * 9), "entity": "task", "entity_id": i, "op": "upsert"}
+            for i in range(1, TASKS + 1)
+        ])
+    return SimpleNamespace(user=3, task=5, label=7)
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def plan_db(request):
+    if request.param == "sqlite":
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        explain, full_scans = "EXPLAIN QUERY PLAN ", _sqlite_full_scans
+    else:
+        url = os.getenv("QUERY_PLAN_POSTGRES_URL")
+        if not url:
+            pytest.skip("QUERY_PLAN_POSTGRES_URL is not set")
+        engine = create_engine(url)
+
+        # With sequential scans priced out, a Seq Scan means no usable index exists.
+        @event.listens_for(engine, "connect")
+        def disable_seqscan(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET enable_seqscan = off")
+            cursor.close()
+
+        explain, full_scans = "EXPLAIN ", _postgres_full_scans
+
+    ids = _seed(engine)
+    yield SimpleNamespace(engine=engine, ids=ids, explain=explain, full_scans=full_scans)
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_service_query_avoids_full_scans(plan_db, name):
+    engine = plan_db.engine
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    db = sessionmaker(bind=engine)()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        QUERIES[name](db, plan_db.ids)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+        db.rollback()
+        db.close()
+        labelService.label_id_cache.clear()
+    assert statements
+
+    offenders = []
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = conn.exec_driver_sql(plan_db.explain + statement, parameters).all()
+            offenders += [f"{detail}  <-  {statement.split()[0]} ... {statement[-80:]!r}" for detail in plan_db.full_scans(plan)]
+
+    if name in KNOWN_FULL_SCANS:
+        if offenders:
+            pytest.xfail(KNOWN_FULL_SCANS[name])
+        if engine.dialect.name == "sqlite":
+            pytest.fail(f"{name} no longer scans; remove it from KNOWN_FULL_SCANS")
+    assert not offenders, "full table scan:\n" + "\n".join(offenders)
@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+@contextmanager
+def count_queries(*engines):
+    """Collect every SQL statement the given (sync) engines execute inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(budget: int, *engines):
+    """Fail when the block issues more than `budget` statements (N+1 guard)."""
+    with count_queries(*engines) as statements:
+        yield statements
+    assert len(statements) <= budget, (
+        f"{len(statements)} statements issued, budget is {budget}:\n" + "\n".join(statements)
+    )